@@ -45,6 +45,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "documents.querybudget.QueryBudgetMiddleware",
+    "documents.admission.AdmissionControlMiddleware",
+    "documents.routers.ReplicaPinMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -88,6 +91,19 @@ DATABASES = {
     }
 }
 
+# Aliases in DATABASES that are read replicas of "default". Views decorated
+# with documents.routers.read_from_replica send their reads to a healthy
+# replica unless the user signed up or wrote within REPLICA_STICKY_SECONDS.
+# The pin travels with the client as a signed, timestamped cookie, so it
+# holds across workers without a shared cache.
+DATABASE_REPLICAS = []
+
+DATABASE_ROUTERS = ["documents.routers.ReplicaRouter"]
+
+REPLICA_STICKY_SECONDS = 10
+
+REPLICA_HEALTH_CHECK_SECONDS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -132,7 +148,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "documents.authentication.RevocableJWTAuthentication",
     ],
 }
 
@@ -149,3 +165,95 @@ AUTH_USER_MODEL = "documents.User"
 DEFAULT_PAGE_SIZE = 10
 
 DEFAULT_PAGE_NUMBER = 1
+
+# import_users hashes passwords in this many processes (None: one per CPU).
+BULK_SIGNUP_HASH_WORKERS = None
+
+# signup/bulk/ hashes in the web worker itself at roughly 10 users a second
+# per CPU, so this keeps one request well inside a 30 second worker timeout.
+BULK_SIGNUP_MAX_USERS = 100
+
+# Upper bound on the page range returned by documents/<uuid>/pages/.
+DOCUMENT_PAGE_RANGE_MAX = 50
+
+# Largest page count an upload may declare; larger values get 400.
+DOCUMENT_MAX_PAGES = 10_000
+
+# Streaming uploads (upload/stream/) are read in chunks of this many bytes
+# and rejected with 413 once they exceed DOCUMENT_UPLOAD_MAX_BYTES.
+DOCUMENT_UPLOAD_CHUNK_SIZE = 64 * 1024
+
+DOCUMENT_UPLOAD_MAX_BYTES = 100 * 1024 * 1024
+
+# Tag suggestions are served from per-user in-memory indexes; least recently
+# used ones are dropped when their estimated total exceeds this budget.
+TAG_INDEX_MAX_BYTES = 64 * 1024 * 1024
+
+TAG_SUGGEST_LIMIT = 10
+
+TAG_SUGGEST_MAX_LIMIT = 50
+
+TOKEN_REVOCATION_BLOOM_CAPACITY = 100000
+
+TOKEN_REVOCATION_BLOOM_ERROR_RATE = 0.001
+
+TOKEN_REVOCATION_REFRESH_SECONDS = 5
+
+TOKEN_REVOCATION_REFRESH_OVERLAP_SECONDS = 60
+
+TOKEN_REVOCATION_PRUNE_SECONDS = 3600
+
+CHANGE_FEED_PAGE_SIZE = 100
+
+CHANGE_FEED_MAX_PAGE_SIZE = 1000
+
+CHANGE_FEED_MAX_WAIT_SECONDS = 25
+
+CHANGE_FEED_POLL_INTERVAL_SECONDS = 0.5
+
+CHANGE_FEED_CURSOR_TTL_SECONDS = 30 * 24 * 3600
+
+# Model written by `manage.py train_classifier`. Uploads use it when the
+# file exists and NumPy/SciPy are installed; predictions below the
+# threshold fall back to the keyword rules.
+DOCUMENT_CLASSIFIER_PATH = BASE_DIR / "document_classifier.npz"
+
+DOCUMENT_CLASSIFIER_THRESHOLD = 0.6
+
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 3600
+
+IDEMPOTENCY_WAIT_SECONDS = 10
+
+IDEMPOTENCY_POLL_INTERVAL_SECONDS = 0.05
+
+# A key claimed by a request that never finished (e.g. its worker was
+# killed) is handed to the next retry after this long. Keep it above the
+# longest a request may run, i.e. the worker timeout.
+IDEMPOTENCY_CLAIM_LEASE_SECONDS = 60
+
+# Per-endpoint (URL name) admission control; see documents/admission.py.
+ADMISSION_CONTROL = {
+    "upload_document": {"max_in_flight": 16},
+    "upload_document_stream": {"max_in_flight": 4},
+    "update_document": {"max_in_flight": 16},
+    "delete_document": {"max_in_flight": 16},
+}
+
+ADMISSION_BUCKET_CAPACITY = 120
+
+ADMISSION_BUCKET_REFILL_PER_SECOND = 2
+
+ADMISSION_BYTES_PER_TOKEN = 1024 * 1024
+
+ADMISSION_BUCKET_STORE = "local"
+
+# When enabled, requests to views decorated with @query_budget are checked
+# against their budget and for SQL repeated this many times (likely N+1
+# queries). Overruns are logged, or raised when strict. Recording costs a
+# little per query, so it is off unless turned on; app.settings_test turns
+# on both.
+QUERY_BUDGET_ENABLED = False
+
+QUERY_BUDGET_STRICT = False
+
+QUERY_BUDGET_REPEAT_THRESHOLD = 3
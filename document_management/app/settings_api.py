@@ -0,0 +1,74 @@
+"""
+Production settings for API-only workers.
+
+Select with DJANGO_SETTINGS_MODULE=app.settings_api. The JSON endpoints
+under api/ authenticate with JWT, so the admin, sessions, messages,
+CSRF, clickjacking and template machinery loaded by app.settings is
+dropped here. Run `python manage.py bench_settings` to compare import
+time, RSS and per-request overhead against the default settings.
+"""
+
+import os
+import sys
+
+# rest_framework.compat imports PyYAML and django.contrib.postgres.fields at
+# startup whenever they are installed, for the YAML renderer and the
+# postgres-specific serializer fields. Neither is used by the JSON
+# endpoints, and together they are the largest optional share of DRF's
+# import time, so this profile marks them as missing.
+for module in ("yaml", "django.contrib.postgres.fields"):
+    sys.modules.setdefault(module, None)
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, REST_FRAMEWORK
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get(
+    "DJANGO_ALLOWED_HOSTS", "localhost,127.0.0.1"
+).split(",")
+
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "rest_framework",
+    "rest_framework_simplejwt",
+    "documents",
+]
+
+MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "documents.querybudget.QueryBudgetMiddleware",
+    "documents.admission.AdmissionControlMiddleware",
+    "documents.routers.ReplicaPinMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+ROOT_URLCONF = "app.urls_api"
+
+TEMPLATES = []
+
+USE_I18N = False
+
+# Keep connections open between requests instead of reconnecting per
+# request. The documents backend adds Django 4.1's CONN_HEALTH_CHECKS to
+# 3.2: a connection is pinged on its first use in a request, so one the
+# server dropped is replaced instead of failing the request's first query.
+DATABASES = {
+    alias: {
+        **config,
+        "ENGINE": config["ENGINE"].replace(
+            "django.db.backends.postgresql", "documents.backends.postgresql"
+        ),
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+    }
+    for alias, config in DATABASES.items()
+}
+
+# JSON only: the browsable API renderer pulls in the template engine and
+# django.forms on first use.
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
+}
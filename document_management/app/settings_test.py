@@ -0,0 +1,27 @@
+"""
+Settings for the test suite.
+
+`python manage.py test` selects this module, and pytest through pytest.ini.
+It adds a SQLite "replica" alias so that replica routing can be tested
+against a second real database. Tests that use it list it in ``databases``
+and turn routing on with ``override_settings(DATABASE_REPLICAS=["replica"])``;
+nothing replicates into it, so tests copy rows over themselves.
+
+Query budgets are enforced, so a view that exceeds its budget or repeats a
+query fails the test that requested it.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+DATABASES = {
+    **DATABASES,
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "replica.sqlite3",
+    },
+}
+
+QUERY_BUDGET_ENABLED = True
+
+QUERY_BUDGET_STRICT = True
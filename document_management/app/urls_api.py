@@ -0,0 +1,11 @@
+"""
+URL configuration for the API-only settings profile (app.settings_api).
+
+Same routes as app.urls without the admin site.
+"""
+
+from django.urls import path, include
+
+urlpatterns = [
+    path('api/', include('documents.urls')),
+]
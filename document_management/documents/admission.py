@@ -0,0 +1,184 @@
+"""
+Admission control for write endpoints.
+
+AdmissionControlMiddleware runs before the view, and so before DRF parses
+the request body. For each endpoint listed in ADMISSION_CONTROL it:
+
+* caps the requests in flight per endpoint in this process and answers
+  503 with Retry-After when the cap is reached;
+* then charges the caller's token bucket one token plus one per
+  ADMISSION_BYTES_PER_TOKEN of Content-Length, and answers 429 with
+  Retry-After when the bucket is empty, or 413 when the body could never
+  fit in a full bucket.
+
+The cap is checked first so that a request turned away with 503 costs the
+caller nothing. Chunked requests without a Content-Length are answered
+with 411: their size is unknown up front, and Django 3.2 would read them
+as an empty body anyway.
+
+Buckets are kept in process by default. Set ADMISSION_BUCKET_STORE to
+"cache" to share them between workers through Django's default cache; the
+read-modify-write is not atomic there, so under heavy contention a few
+extra requests may be admitted.
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class LocalBucketStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, cost, capacity, refill_rate):
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                return False, (cost - tokens) / refill_rate
+            self._buckets[key] = (tokens - cost, now)
+            return True, 0.0
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    def take(self, key, cost, capacity, refill_rate):
+        cache_key = f"admission-bucket:{key}"
+        now = time.time()
+        tokens, updated_at = cache.get(cache_key, (capacity, now))
+        tokens = min(capacity, tokens + max(now - updated_at, 0) * refill_rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        cache.set(cache_key, (tokens, now), math.ceil(capacity / refill_rate) + 1)
+        return allowed, 0.0 if allowed else (cost - tokens) / refill_rate
+
+    def clear(self):
+        pass
+
+
+class AdmissionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._counters = defaultdict(lambda: defaultdict(int))
+            self._in_flight = defaultdict(int)
+
+    def incr(self, endpoint, counter):
+        with self._lock:
+            self._counters[endpoint][counter] += 1
+
+    def enter(self, endpoint, limit):
+        with self._lock:
+            if self._in_flight[endpoint] >= limit:
+                return False
+            self._in_flight[endpoint] += 1
+            return True
+
+    def leave(self, endpoint):
+        with self._lock:
+            self._in_flight[endpoint] -= 1
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = set(self._counters) | set(self._in_flight)
+            return {
+                endpoint: {
+                    **self._counters[endpoint],
+                    "in_flight": self._in_flight[endpoint],
+                }
+                for endpoint in sorted(endpoints)
+            }
+
+
+local_buckets = LocalBucketStore()
+cache_buckets = CacheBucketStore()
+stats = AdmissionStats()
+
+
+def get_bucket_store():
+    if settings.ADMISSION_BUCKET_STORE == "cache":
+        return cache_buckets
+    return local_buckets
+
+
+def client_key(request):
+    header = request.META.get("HTTP_AUTHORIZATION", "").split()
+    if len(header) == 2:
+        try:
+            return f"user:{AccessToken(header[1])['user_id']}"
+        except (TokenError, KeyError):
+            pass
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def reject(message, status, retry_after=None):
+    response = JsonResponse({"error": message}, status=status)
+    if retry_after is not None:
+        response["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            endpoint = resolve(request.path_info).url_name
+        except Resolver404:
+            return self.get_response(request)
+        config = settings.ADMISSION_CONTROL.get(endpoint)
+        if config is None:
+            return self.get_response(request)
+
+        if "chunked" in request.META.get(
+            "HTTP_TRANSFER_ENCODING", ""
+        ).lower() and not request.META.get("CONTENT_LENGTH"):
+            stats.incr(endpoint, "rejected_length_required")
+            return reject("Content-Length is required.", 411)
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+        capacity = settings.ADMISSION_BUCKET_CAPACITY
+        cost = 1 + content_length / settings.ADMISSION_BYTES_PER_TOKEN
+        if cost > capacity:
+            stats.incr(endpoint, "rejected_too_large")
+            return reject("Request body is too large.", 413)
+
+        if not stats.enter(endpoint, config["max_in_flight"]):
+            stats.incr(endpoint, "rejected_overloaded")
+            return reject("Server is busy, please retry.", 503, 1)
+        try:
+            allowed, retry_after = get_bucket_store().take(
+                client_key(request),
+                cost,
+                capacity,
+                settings.ADMISSION_BUCKET_REFILL_PER_SECOND,
+            )
+            if not allowed:
+                stats.incr(endpoint, "rejected_rate_limited")
+                return reject("Rate limit exceeded.", 429, retry_after)
+            stats.incr(endpoint, "admitted")
+            return self.get_response(request)
+        finally:
+            stats.leave(endpoint)
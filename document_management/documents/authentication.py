@@ -0,0 +1,14 @@
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .revocation import revocation_list
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        jti = validated_token.get(settings.SIMPLE_JWT.get("JTI_CLAIM", "jti"))
+        if jti and revocation_list.is_revoked(jti):
+            raise InvalidToken("Token has been revoked")
+        return validated_token
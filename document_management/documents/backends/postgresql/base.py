@@ -0,0 +1,37 @@
+"""
+PostgreSQL backend with CONN_HEALTH_CHECKS for Django 3.2.
+
+Django 4.1 added the CONN_HEALTH_CHECKS database option; this backend
+gives 3.2 the same behaviour. A persistent connection is pinged once per
+request, when the request first opens a cursor on it, and replaced if the
+server has dropped it. Requests that never touch an alias never ping it.
+A connection that saw an error is already pinged by Django at request
+start and is not pinged again.
+"""
+
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    health_check_done = False
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        pinged = self.connection is not None and self.errors_occurred
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = pinged and self.connection is not None
+
+    def _cursor(self, name=None):
+        if (
+            self.settings_dict.get("CONN_HEALTH_CHECKS")
+            and self.connection is not None
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        return super()._cursor(name)
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import ChangeCursor, ChangeSequence, DocumentChange
+
+
+def record_change(user_id, action, document_uuid):
+    # The sequence row stays locked until the surrounding transaction
+    # commits, so a user's changes become visible strictly in seq order
+    # and a client reading "seq > n" can never skip a late commit.
+    with transaction.atomic():
+        sequence, _ = ChangeSequence.objects.select_for_update().get_or_create(
+            user_id=user_id
+        )
+        sequence.last_seq += 1
+        sequence.save(update_fields=["last_seq"])
+        return DocumentChange.objects.create(
+            user_id=user_id,
+            seq=sequence.last_seq,
+            action=action,
+            document_uuid=document_uuid,
+        )
+
+
+def get_sequence(user_id):
+    return ChangeSequence.objects.filter(user_id=user_id).first() or ChangeSequence(
+        user_id=user_id
+    )
+
+
+def changes_since(user_id, since, limit):
+    changes = list(
+        DocumentChange.objects.filter(user_id=user_id, seq__gt=since).order_by("seq")[
+            : limit + 1
+        ]
+    )
+    return changes[:limit], len(changes) > limit
+
+
+def acknowledge(user_id, client_id, seq):
+    ChangeCursor.objects.update_or_create(
+        user_id=user_id, client_id=client_id, defaults={"seq": seq}
+    )
+
+
+def compact_changes(user_id):
+    """
+    Delete the user's log entries that every live cursor has passed.
+
+    Cursors not seen for CHANGE_FEED_CURSOR_TTL_SECONDS are forgotten first.
+    With no live cursors the whole log is compacted. Clients asking for
+    changes before the compacted point get a 410 and must re-list.
+    """
+    stale_before = timezone.now() - timedelta(
+        seconds=settings.CHANGE_FEED_CURSOR_TTL_SECONDS
+    )
+    ChangeCursor.objects.filter(user_id=user_id, updated_at__lt=stale_before).delete()
+
+    with transaction.atomic():
+        sequence = (
+            ChangeSequence.objects.select_for_update().filter(user_id=user_id).first()
+        )
+        if sequence is None:
+            return 0
+        floor = ChangeCursor.objects.filter(user_id=user_id).aggregate(
+            floor=Min("seq")
+        )["floor"]
+        floor = sequence.last_seq if floor is None else min(floor, sequence.last_seq)
+        if floor <= sequence.compacted_seq:
+            return 0
+        deleted, _ = DocumentChange.objects.filter(
+            user_id=user_id, seq__lte=floor
+        ).delete()
+        sequence.compacted_seq = floor
+        sequence.save(update_fields=["compacted_seq"])
+        return deleted
@@ -0,0 +1,233 @@
+"""
+Optional statistical document classifier.
+
+A hashed TF-IDF vectorizer feeding a multinomial logistic regression,
+implemented with NumPy and SciPy sparse matrices. A model is trained
+offline with ``manage.py train_classifier`` and written to
+DOCUMENT_CLASSIFIER_PATH. When no model file exists, or NumPy/SciPy are
+not installed, every caller falls back to the keyword rules.
+
+NumPy and SciPy are imported lazily so that workers without a model do
+not pay for them at startup.
+"""
+
+import os
+import re
+import threading
+import zlib
+
+from django.conf import settings
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+", re.IGNORECASE)
+
+BIGRAM_MULTIPLIER = 1000003
+
+HASH_MEMO_SIZE = 1_000_000
+
+_hash_memo = {}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _token_hash(token):
+    value = _hash_memo.get(token)
+    if value is None:
+        if len(_hash_memo) >= HASH_MEMO_SIZE:
+            _hash_memo.clear()
+        value = _hash_memo[token] = zlib.crc32(token.lower().encode())
+    return value
+
+
+def _tokens(text):
+    """Yield the tokens of a string or of an iterable of string chunks."""
+    if isinstance(text, str):
+        yield from TOKEN_PATTERN.findall(text)
+        return
+    # A token at the end of a chunk may continue in the next one.
+    tail = ""
+    for chunk in text:
+        chunk = tail + chunk
+        tokens = TOKEN_PATTERN.findall(chunk)
+        tail = tokens.pop() if tokens and TOKEN_PATTERN.match(chunk[-1:]) else ""
+        yield from tokens
+    if tail:
+        yield tail
+
+
+def numpy_available():
+    try:
+        import numpy  # noqa: F401
+        import scipy.sparse  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HashedTfidfClassifier:
+    def __init__(self, n_features=2**18):
+        self.n_features = n_features
+        self.classes = []
+        self.idf = None
+        self.weights = None
+        self.bias = None
+
+    def _term_frequencies(self, texts):
+        import numpy as np
+        from scipy import sparse
+
+        # Tokens are hashed once each (through a memo, since vocabularies
+        # are heavily repeated) and everything after that is array math:
+        # bigram features are derived from neighbouring token hashes and
+        # duplicate (row, feature) pairs are summed by the COO -> CSR
+        # conversion.
+        columns = []
+        row_ids = []
+        for row, text in enumerate(texts):
+            token_hashes = np.fromiter(
+                (_token_hash(token) for token in _tokens(text)), dtype=np.int64
+            )
+            bigrams = token_hashes[:-1] * BIGRAM_MULTIPLIER + token_hashes[1:]
+            features = np.concatenate([token_hashes, bigrams]) % self.n_features
+            columns.append(features)
+            row_ids.append(np.full(len(features), row, dtype=np.int64))
+
+        columns = np.concatenate(columns) if columns else np.zeros(0, np.int64)
+        row_ids = np.concatenate(row_ids) if row_ids else np.zeros(0, np.int64)
+        counts = sparse.csr_matrix(
+            (np.ones(len(columns)), (row_ids, columns)),
+            shape=(len(texts), self.n_features),
+        )
+        counts.sum_duplicates()
+        counts.data = 1.0 + np.log(counts.data)
+        return counts
+
+    def _normalize(self, matrix):
+        import numpy as np
+        from scipy import sparse
+
+        matrix = matrix @ sparse.diags(self.idf)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms) @ matrix
+
+    def transform(self, texts):
+        return self._normalize(self._term_frequencies(texts))
+
+    def fit(self, texts, labels, regularization=1e-4, max_iter=200):
+        import numpy as np
+        from scipy.optimize import minimize
+
+        self.classes = sorted(set(labels))
+        counts = self._term_frequencies(texts)
+        document_frequency = np.bincount(counts.indices, minlength=self.n_features)
+        self.idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1.0
+        features = self._normalize(counts)
+
+        class_index = {label: i for i, label in enumerate(self.classes)}
+        targets = np.zeros((len(texts), len(self.classes)))
+        targets[np.arange(len(texts)), [class_index[label] for label in labels]] = 1.0
+        shape = (self.n_features, len(self.classes))
+        size = shape[0] * shape[1]
+
+        def loss(params):
+            weights = params[:size].reshape(shape)
+            bias = params[size:]
+            logits = features @ weights + bias
+            logits -= logits.max(axis=1, keepdims=True)
+            log_probs = logits - np.log(np.exp(logits).sum(axis=1, keepdims=True))
+            error = (np.exp(log_probs) - targets) / len(texts)
+            value = -(targets * log_probs).sum() / len(texts)
+            value += regularization / 2 * (weights * weights).sum()
+            gradient = np.concatenate(
+                [
+                    (features.T @ error + regularization * weights).ravel(),
+                    error.sum(axis=0),
+                ]
+            )
+            return value, gradient
+
+        result = minimize(
+            loss,
+            np.zeros(size + len(self.classes)),
+            jac=True,
+            method="L-BFGS-B",
+            options={"maxiter": max_iter},
+        )
+        self.weights = result.x[:size].reshape(shape)
+        self.bias = result.x[size:]
+        return self
+
+    def predict_proba(self, texts):
+        import numpy as np
+
+        logits = self.transform(texts) @ self.weights + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def save(self, path):
+        import numpy as np
+
+        # Features that never occur in training keep zero weights, so only
+        # the non-zero rows are stored to keep the file small.
+        rows = np.flatnonzero(np.abs(self.weights).sum(axis=1))
+        np.savez_compressed(
+            path,
+            n_features=self.n_features,
+            classes=np.asarray(self.classes),
+            idf=self.idf,
+            rows=rows,
+            weights=self.weights[rows],
+            bias=self.bias,
+        )
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+
+        with np.load(path) as data:
+            model = cls(n_features=int(data["n_features"]))
+            model.classes = [str(label) for label in data["classes"]]
+            model.idf = data["idf"]
+            model.weights = np.zeros((model.n_features, len(model.classes)))
+            model.weights[data["rows"]] = data["weights"]
+            model.bias = data["bias"]
+        return model
+
+
+def load_classifier():
+    """Return the trained model, reloading it when the file changes."""
+    path = settings.DOCUMENT_CLASSIFIER_PATH
+    if not path or not os.path.exists(path) or not numpy_available():
+        return None
+    mtime = os.path.getmtime(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, HashedTfidfClassifier.load(path))
+            _cache[path] = cached
+    return cached[1]
+
+
+def classify_texts(texts, fallback_types):
+    """
+    Classify a batch of texts in one vectorized call.
+
+    Each text may be a string or an iterable of string chunks, which is
+    read once. ``fallback_types`` holds the keyword-rule result for each
+    text and is used wherever the model is missing or less confident than
+    DOCUMENT_CLASSIFIER_THRESHOLD.
+    """
+    model = load_classifier()
+    if model is None or not texts:
+        return list(fallback_types)
+    probabilities = model.predict_proba(texts)
+    best = probabilities.argmax(axis=1)
+    confidence = probabilities.max(axis=1)
+    return [
+        model.classes[index]
+        if score >= settings.DOCUMENT_CLASSIFIER_THRESHOLD
+        else fallback
+        for index, score, fallback in zip(best, confidence, fallback_types)
+    ]
@@ -0,0 +1,113 @@
+import re
+
+DOCUMENT_TYPE_KEYWORDS = {
+    "ID Card": ["id number", "date of birth"],
+    "IRS Form": ["internal revenue service", "taxpayer id"],
+    "Passport": ["passport number", "nationality"],
+    "Bank Statement": ["account number", "transaction history"],
+}
+
+FIELD_KEYWORDS = {
+    "passport number": "passport_number",
+    "account number": "account_number",
+    "taxpayer id": "taxpayer_id",
+    "id number": "id_number",
+}
+
+MAX_FIELDS_PER_DOCUMENT = 50
+
+_keywords = sorted(
+    {term for terms in DOCUMENT_TYPE_KEYWORDS.values() for term in terms},
+    key=len,
+    reverse=True,
+)
+
+# One compiled pattern finds every keyword and, right after it, a possible
+# identifier such as "Account No.: 1234-5678" or "1234 5678 9012". The whole
+# match sits in a lookahead so overlapping keywords ("taxpayer id number")
+# are all found in a single scan, matching the old one-search-per-keyword
+# behaviour. Any occurrence of a keyword counts for classification, but a
+# value is only captured when the keyword stands on word boundaries, so
+# "Valid number 12345" is not read as an ID number.
+KEYWORD_PATTERN = re.compile(
+    r"(?=(?P<bounded>\b)?(?P<keyword>"
+    + "|".join(re.escape(keyword) for keyword in _keywords)
+    + r")(?(bounded)(?:\b(?:[ \t]{0,3}(?:number|num\.?|no\.?))?[ \t]{0,3}"
+    r"[:#-]?[ \t]{0,3}"
+    r"(?P<value>(?=[A-Z-]{0,31}\d)[A-Z0-9](?:[A-Z0-9-]|(?<=\d) (?=\d)){2,31}))?))",
+    re.IGNORECASE,
+)
+
+
+def normalize_field_value(value):
+    return re.sub(r"[\s-]", "", value).upper()
+
+
+def classify_keywords(found):
+    for doc_type, terms in DOCUMENT_TYPE_KEYWORDS.items():
+        if any(term in found for term in terms):
+            return doc_type
+    return "Unknown"
+
+
+class TextAnalyzer:
+    """Incremental form of ``analyze_text`` for text that arrives in chunks.
+
+    Matches starting in the last OVERLAP characters seen so far may still
+    be cut short by the chunk boundary, so they are held back and searched
+    again once the next chunk arrives, together with the one character
+    before them that the keyword's word boundary looks at. Matches are at
+    most 72 characters long, so the result is the same as analysing the
+    whole text at once.
+    """
+
+    OVERLAP = 128
+
+    def __init__(self):
+        self._found = set()
+        self._fields = {}
+        self._tail = ""
+        self._start = 0
+
+    def _scan(self, text, start, limit):
+        for match in KEYWORD_PATTERN.finditer(text, start):
+            if match.start() >= limit:
+                break
+            keyword = match.group("keyword").lower()
+            self._found.add(keyword)
+            value = match.group("value")
+            if not value or keyword not in FIELD_KEYWORDS:
+                continue
+            if len(self._fields) < MAX_FIELDS_PER_DOCUMENT:
+                field = (FIELD_KEYWORDS[keyword], normalize_field_value(value))
+                self._fields.setdefault(field, None)
+
+    def feed(self, chunk):
+        text = self._tail + chunk
+        limit = len(text) - self.OVERLAP
+        if limit > self._start:
+            self._scan(text, self._start, limit)
+            text = text[limit - 1 :]
+            self._start = 1
+        self._tail = text
+
+    def finish(self):
+        self._scan(self._tail, self._start, len(self._tail))
+        self._tail = ""
+        self._start = 0
+        return classify_keywords(self._found), list(self._fields)
+
+
+def analyze_text(text):
+    """Classify text and extract identifier fields in one pass.
+
+    Returns ``(doc_type, fields)`` where ``fields`` is a list of unique
+    ``(field, normalized_value)`` pairs in order of appearance.
+    """
+    analyzer = TextAnalyzer()
+    analyzer._scan(text, 0, len(text))
+    return analyzer.finish()
+
+
+def detect_document_type(text):
+    return analyze_text(text)[0]
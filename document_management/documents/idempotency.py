@@ -0,0 +1,180 @@
+import hashlib
+import time
+from datetime import timedelta
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .querybudget import unbudgeted
+
+
+def _cache_key(user_id, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"idempotency:{user_id}:{digest}"
+
+
+def _fingerprint(request, hash_body):
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.path}\n".encode())
+    if hash_body:
+        digest.update(request.body)
+    else:
+        media_type = request.META.get("CONTENT_TYPE", "").split(";")[0]
+        digest.update(
+            f"{request.META.get('QUERY_STRING', '')}\n{media_type}\n"
+            f"{request.META.get('CONTENT_LENGTH', '')}".encode()
+        )
+    return digest.hexdigest()
+
+
+def _replay(stored, fingerprint):
+    if stored["fingerprint"] != fingerprint:
+        return Response(
+            {"error": "Idempotency-Key was already used with a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(
+        stored["response_body"],
+        status=stored["status_code"],
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _stored(record):
+    return {
+        "fingerprint": record.fingerprint,
+        "status_code": record.status_code,
+        "response_body": record.response_body,
+    }
+
+
+def _claim(user_id, key, fingerprint):
+    """Insert the key, or return the existing record if another request owns it."""
+    now = timezone.now()
+    expired_before = now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+    abandoned_before = now - timedelta(
+        seconds=settings.IDEMPOTENCY_CLAIM_LEASE_SECONDS
+    )
+    IdempotencyKey.objects.filter(
+        Q(created_at__lt=expired_before)
+        | Q(status_code__isnull=True, created_at__lt=abandoned_before),
+        user_id=user_id,
+        key=key,
+    ).delete()
+    try:
+        with transaction.atomic():
+            return (
+                IdempotencyKey.objects.create(
+                    user_id=user_id, key=key, fingerprint=fingerprint
+                ),
+                True,
+            )
+    except IntegrityError:
+        return IdempotencyKey.objects.filter(user_id=user_id, key=key).first(), False
+
+
+# How many times this polls depends on the other request, not this one.
+@unbudgeted()
+def _wait_for(user_id, key):
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        stored = cache.get(_cache_key(user_id, key))
+        if stored is not None:
+            return stored
+        record = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+        if record is None:
+            return None
+        if record.status_code is not None:
+            return _stored(record)
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL_SECONDS)
+
+
+def idempotent(view=None, *, hash_body=True):
+    """
+    Honour an Idempotency-Key header on a write view.
+
+    The first request with a given key runs the view and stores its
+    response in the cache and the IdempotencyKey table for
+    IDEMPOTENCY_KEY_TTL_SECONDS. Retries replay that response without
+    running the view again. Duplicates that arrive while the first request
+    is still running wait up to IDEMPOTENCY_WAIT_SECONDS for its result.
+    Server errors are not stored, so the client may retry them. A claim
+    whose request never finished is taken over by the first retry after
+    IDEMPOTENCY_CLAIM_LEASE_SECONDS.
+
+    Streaming views pass ``hash_body=False`` so the body is left unread;
+    their requests are then told apart by query string, media type and
+    Content-Length rather than by a hash of the body.
+    """
+    if view is None:
+        return partial(idempotent, hash_body=hash_body)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {"error": "Idempotency-Key must be at most 255 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        user_id = request.user.pk
+        fingerprint = _fingerprint(request, hash_body)
+        stored = cache.get(_cache_key(user_id, key))
+        if stored is not None:
+            return _replay(stored, fingerprint)
+
+        record, claimed = _claim(user_id, key, fingerprint)
+        if not claimed:
+            stored = (
+                _stored(record)
+                if record is not None and record.status_code is not None
+                else _wait_for(user_id, key)
+            )
+            if stored is None:
+                return Response(
+                    {"error": "A request with this Idempotency-Key is in progress."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            cache.set(
+                _cache_key(user_id, key), stored, settings.IDEMPOTENCY_KEY_TTL_SECONDS
+            )
+            return _replay(stored, fingerprint)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            # Including SystemExit, which a worker timeout raises.
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+            return response
+
+        record.status_code = response.status_code
+        record.response_body = response.data
+        # Zero rows when the lease ran out and a retry took the key over;
+        # the retry's own response is the one stored.
+        if not IdempotencyKey.objects.filter(pk=record.pk).update(
+            status_code=record.status_code, response_body=record.response_body
+        ):
+            return response
+        cache.set(
+            _cache_key(user_id, key),
+            _stored(record),
+            settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+        )
+        return response
+
+    return wrapper
@@ -0,0 +1,62 @@
+"""
+Filtering and ordering for list/.
+
+Every combination accepted here is served by one of the composite indexes
+on Document: the user, then doc_type when filtered on, then the sort
+column, then id. A pages range combined with another ordering is applied
+as a filter on that index's rows, except with a doc_type, where the rows
+in range are read from the doc_type/pages index and sorted.
+
+The "id" ordering is upload order, sorted on created_at. PostgreSQL would
+serve ORDER BY id from the primary key and filter every tenant's rows on
+the way, since it cannot tell that a user's rows are clustered by id.
+"""
+
+ORDERINGS = {
+    "id": ("created_at", "id"),
+    "created_at": ("created_at", "id"),
+    "-created_at": ("-created_at", "-id"),
+    "pages": ("pages", "id"),
+    "-pages": ("-pages", "-id"),
+}
+
+DEFAULT_ORDERING = "id"
+
+
+class InvalidListParameter(ValueError):
+    pass
+
+
+def _int_param(params, name):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidListParameter(f"{name} must be an integer.")
+
+
+def filter_documents(queryset, params):
+    """Apply the tags, doc_type, pages_min, pages_max and ordering params."""
+    tags = params.get("tags")
+    if tags:
+        queryset = queryset.filter(tags__contains=[tags.lower()])
+
+    doc_type = params.get("doc_type")
+    if doc_type:
+        queryset = queryset.filter(doc_type=doc_type)
+
+    pages_min = _int_param(params, "pages_min")
+    if pages_min is not None:
+        queryset = queryset.filter(pages__gte=pages_min)
+    pages_max = _int_param(params, "pages_max")
+    if pages_max is not None:
+        queryset = queryset.filter(pages__lte=pages_max)
+
+    ordering = params.get("ordering") or DEFAULT_ORDERING
+    if ordering not in ORDERINGS:
+        raise InvalidListParameter(
+            f"ordering must be one of {', '.join(ORDERINGS)}."
+        )
+    return queryset.order_by(*ORDERINGS[ordering])
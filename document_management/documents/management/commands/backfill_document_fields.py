@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from documents.extraction import analyze_text
+from documents.models import Document, DocumentField
+from documents.pages import with_text
+
+
+class Command(BaseCommand):
+    help = "Extract identifier fields from existing documents into DocumentField."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        documents = with_text(
+            Document.objects.order_by("id").only("id", "text", "uploaded_by_id")
+        )
+        last_id = 0
+        processed = extracted = 0
+        while True:
+            batch = list(documents.filter(id__gt=last_id)[: options["batch_size"]])
+            if not batch:
+                break
+            rows = [
+                DocumentField(
+                    user_id=document.uploaded_by_id,
+                    document=document,
+                    field=field,
+                    value=value,
+                )
+                for document in batch
+                for field, value in analyze_text(document.full_text)[1]
+            ]
+            with transaction.atomic():
+                DocumentField.objects.filter(document__in=batch).delete()
+                DocumentField.objects.bulk_create(rows)
+            last_id = batch[-1].id
+            processed += len(batch)
+            extracted += len(rows)
+            self.stdout.write(f"Processed {processed} documents", ending="\r")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Extracted {extracted} fields from {processed} documents."
+            )
+        )
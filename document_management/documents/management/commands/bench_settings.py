@@ -0,0 +1,115 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter per settings module so that import time and
+# RSS are not polluted by the parent process.
+PROBE = r"""
+import io, json, resource, sys, time
+
+started = time.perf_counter()
+import django
+django.setup()
+from django.core.handlers.wsgi import WSGIHandler, WSGIRequest
+from django.urls import resolve
+handler = WSGIHandler()
+setup_ms = (time.perf_counter() - started) * 1000
+
+def environ():
+    return {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": "/api/login/",
+        "QUERY_STRING": "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "localhost",
+        "wsgi.input": io.BytesIO(b""),
+        "wsgi.url_scheme": "http",
+        "wsgi.errors": sys.stderr,
+    }
+
+def start_response(status, headers):
+    pass
+
+view = resolve("/api/login/").func
+requests = int(sys.argv[1])
+for _ in range(50):
+    handler(environ(), start_response)
+    view(WSGIRequest(environ()))
+
+started = time.perf_counter()
+for _ in range(requests):
+    handler(environ(), start_response)
+full_us = (time.perf_counter() - started) / requests * 1e6
+
+started = time.perf_counter()
+for _ in range(requests):
+    view(WSGIRequest(environ()))
+view_us = (time.perf_counter() - started) / requests * 1e6
+
+print(json.dumps({
+    "setup_ms": setup_ms,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "request_us": full_us,
+    "middleware_us": full_us - view_us,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare import time, worker RSS and per-request middleware overhead "
+        "between settings modules."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "settings_modules",
+            nargs="*",
+            default=["app.settings", "app.settings_api"],
+        )
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def probe(self, settings_module, requests):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE, str(requests)],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"{settings_module}: {result.stderr.strip()}")
+
+        import_us = 0
+        modules = 0
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            import_us += int(line.split("|")[0].split(":")[1])
+            modules += 1
+
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        stats["import_ms"] = import_us / 1000
+        stats["modules"] = modules
+        return stats
+
+    def handle(self, *args, **options):
+        header = (
+            f"{'settings':<28}{'modules':>9}{'import ms':>11}{'setup ms':>10}"
+            f"{'RSS MB':>9}{'request us':>12}{'middleware us':>15}"
+        )
+        self.stdout.write(header)
+        for settings_module in options["settings_modules"]:
+            stats = self.probe(settings_module, options["requests"])
+            self.stdout.write(
+                f"{settings_module:<28}{stats['modules']:>9}"
+                f"{stats['import_ms']:>11.1f}{stats['setup_ms']:>10.1f}"
+                f"{stats['rss_kb'] / 1024:>9.1f}{stats['request_us']:>12.1f}"
+                f"{stats['middleware_us']:>15.1f}"
+            )
@@ -0,0 +1,98 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from documents.models import Document, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-user list query latency while the total corpus grows. "
+        "Everything is written inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[10000, 100000, 1000000],
+            help="Total corpus sizes to measure at.",
+        )
+        parser.add_argument("--tenants", type=int, default=200)
+        parser.add_argument(
+            "--per-tenant",
+            type=int,
+            default=100,
+            help="Documents owned by each measured tenant.",
+        )
+        parser.add_argument(
+            "--filler-tenants",
+            type=int,
+            default=1000,
+            help="Other tenants that own the rest of the corpus.",
+        )
+        parser.add_argument("--queries", type=int, default=500)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def seed(self, users, count, batch_size):
+        for start in range(0, count, batch_size):
+            Document.objects.bulk_create(
+                [
+                    Document(
+                        pages=1,
+                        text="account number 1234 transaction history",
+                        tags=["bench"],
+                        doc_type="Bank Statement",
+                        uploaded_by=users[(start + i) % len(users)],
+                    )
+                    for i in range(min(batch_size, count - start))
+                ]
+            )
+
+    def measure(self, tenants, queries):
+        timings = []
+        for i in range(queries):
+            user = tenants[i % len(tenants)]
+            started = time.perf_counter()
+            list(Document.objects.filter(uploaded_by=user).order_by("id")[:10])
+            Document.objects.filter(uploaded_by=user).count()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95)]
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            self.stderr.write("Results are only meaningful on PostgreSQL.")
+
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [
+                    User(email=f"bench-tenant-{i}@example.invalid")
+                    for i in range(options["tenants"])
+                ]
+                + [
+                    User(email=f"bench-filler-{i}@example.invalid")
+                    for i in range(options["filler_tenants"])
+                ]
+            )
+            tenants = list(User.objects.filter(email__startswith="bench-tenant-"))
+            fillers = list(User.objects.filter(email__startswith="bench-filler-"))
+            self.seed(
+                tenants, len(tenants) * options["per_tenant"], options["batch_size"]
+            )
+
+            self.stdout.write(f"{'corpus':>10}{'p50 ms':>10}{'p95 ms':>10}")
+            total = Document.objects.count()
+            for size in sorted(options["sizes"]):
+                if size > total:
+                    self.seed(fillers, size - total, options["batch_size"])
+                    total = size
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {Document._meta.db_table}")
+                p50, p95 = self.measure(tenants, options["queries"])
+                self.stdout.write(f"{total:>10}{p50:>10.3f}{p95:>10.3f}")
+
+            transaction.set_rollback(True)
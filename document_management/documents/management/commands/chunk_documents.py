@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from documents.models import Document, DocumentPage
+from documents.pages import split_pages
+
+
+class Command(BaseCommand):
+    help = "Move the inline text of older documents into per-page DocumentPage rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        documents = (
+            Document.objects.exclude(text="")
+            .order_by("id")
+            .only("id", "pages", "text")
+        )
+        last_id = 0
+        processed = stored = 0
+        while True:
+            batch = list(documents.filter(id__gt=last_id)[: options["batch_size"]])
+            if not batch:
+                break
+            rows = [
+                DocumentPage(document=document, page_no=page_no, text=chunk)
+                for document in batch
+                for page_no, chunk in enumerate(
+                    split_pages(document.text, document.pages), start=1
+                )
+            ]
+            with transaction.atomic():
+                DocumentPage.objects.filter(document__in=batch).delete()
+                DocumentPage.objects.bulk_create(rows)
+                Document.objects.filter(id__in=[d.id for d in batch]).update(text="")
+            last_id = batch[-1].id
+            processed += len(batch)
+            stored += len(rows)
+            self.stdout.write(f"Processed {processed} documents", ending="\r")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Stored {stored} pages for {processed} documents.")
+        )
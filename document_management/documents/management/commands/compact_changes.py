@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from documents.changes import compact_changes
+from documents.models import ChangeSequence
+
+
+class Command(BaseCommand):
+    help = "Delete change-feed entries that every live client cursor has passed."
+
+    def handle(self, *args, **options):
+        deleted = 0
+        user_ids = ChangeSequence.objects.values_list("user_id", flat=True)
+        for user_id in user_ids.iterator():
+            deleted += compact_changes(user_id)
+        self.stdout.write(self.style.SUCCESS(f"Compacted {deleted} change entries."))
@@ -0,0 +1,62 @@
+import csv
+import itertools
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.provisioning import bulk_create_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users from a CSV file with email and password columns, "
+        "hashing passwords in parallel and inserting in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Password hashing processes (default: BULK_SIGNUP_HASH_WORKERS).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            handle = open(options["path"], newline="", encoding="utf-8")
+        except OSError as e:
+            raise CommandError(str(e))
+
+        created = failed = 0
+        elapsed = 0.0
+        with handle:
+            reader = csv.DictReader(handle)
+            if not {"email", "password"} <= set(reader.fieldnames or []):
+                raise CommandError("The CSV needs email and password columns.")
+            # Data starts on line 2, after the header.
+            line = 2
+            while True:
+                batch = list(itertools.islice(reader, options["batch_size"]))
+                if not batch:
+                    break
+                result = bulk_create_users(batch, options["workers"], start=line)
+                for error in result.as_dict()["errors"]:
+                    self.stderr.write(
+                        f"line {error['row']}: {error['email']}: {error['error']}"
+                    )
+                line += len(batch)
+                created += len(result.created)
+                failed += len(result.errors)
+                elapsed += result.elapsed
+                self.stdout.write(
+                    f"Created {created} users ({failed} failed)", ending="\r"
+                )
+
+        rate = created / elapsed if elapsed else 0.0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {created} users, {failed} failed, in {elapsed:.1f}s "
+                f"({rate:.1f} users/sec)."
+            )
+        )
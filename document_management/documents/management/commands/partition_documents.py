@@ -0,0 +1,140 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from documents.models import Document, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert the documents table into a PostgreSQL table hash-partitioned "
+        "on uploaded_by_id. Run after all migrations have been applied."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--partitions", type=int, default=16)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the SQL instead of executing it.",
+        )
+
+    def fetch(self, cursor, sql, params=None):
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+    def build_statements(self, cursor, partitions):
+        table = Document._meta.db_table
+        old_table = f"{table}_unpartitioned"
+
+        [(sequence,)] = self.fetch(
+            cursor, "SELECT pg_get_serial_sequence(%s, 'id')", [table]
+        )
+        # Existing secondary indexes are recreated on the partitioned parent,
+        # which propagates them to every partition. The primary key and the
+        # uuid constraint are replaced below because unique constraints on a
+        # partitioned table must include the partition key.
+        indexes = self.fetch(
+            cursor,
+            """
+            SELECT i.relname, pg_get_indexdef(i.oid), ix.indisunique
+            FROM pg_index ix
+            JOIN pg_class i ON i.oid = ix.indexrelid
+            WHERE ix.indrelid = %s::regclass
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_constraint c WHERE c.conindid = ix.indexrelid
+            )
+            """,
+            [table],
+        )
+        referencing = self.fetch(
+            cursor,
+            """
+            SELECT conrelid::regclass::text, conname
+            FROM pg_constraint
+            WHERE confrelid = %s::regclass AND contype = 'f'
+            """,
+            [table],
+        )
+
+        user_table = User._meta.db_table
+        statements = [
+            # Flush pending deferred FK checks, which would block DROP TABLE.
+            "SET CONSTRAINTS ALL IMMEDIATE",
+            f"ALTER TABLE {table} RENAME TO {old_table}",
+            f"CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS) "
+            f"PARTITION BY HASH (uploaded_by_id)",
+        ]
+        if sequence:
+            statements.append(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+        statements += [
+            f"CREATE TABLE {table}_p{remainder} PARTITION OF {table} "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            for remainder in range(partitions)
+        ]
+        statements.append(f"INSERT INTO {table} SELECT * FROM {old_table}")
+        # Foreign keys into the documents table cannot point at a partitioned
+        # table through id alone. Deletes still cascade through the ORM.
+        statements += [
+            f"ALTER TABLE {referencing_table} DROP CONSTRAINT {name}"
+            for referencing_table, name in referencing
+        ]
+        # Dropping the old table frees its index names for reuse below.
+        statements += [
+            f"DROP TABLE {old_table}",
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey "
+            f"PRIMARY KEY (id, uploaded_by_id)",
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_uuid_uploaded_by_id_uniq "
+            f"UNIQUE (uuid, uploaded_by_id)",
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_uploaded_by_id_fk "
+            f"FOREIGN KEY (uploaded_by_id) REFERENCES {user_table} (id) "
+            f"DEFERRABLE INITIALLY DEFERRED",
+        ]
+        for name, definition, unique in indexes:
+            if unique:
+                self.stderr.write(
+                    f"Skipping unique index {name}: it does not include "
+                    f"uploaded_by_id. Recreate it with the partition key."
+                )
+                continue
+            statements.append(
+                re.sub(r" ON (ONLY )?\S+ USING ", f" ON {table} USING ", definition)
+            )
+        statements += [
+            f"CREATE INDEX IF NOT EXISTS {table}_tags_gin "
+            f"ON {table} USING GIN (tags jsonb_path_ops)",
+            f"ANALYZE {table}",
+        ]
+        return statements
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning requires PostgreSQL.")
+        if options["partitions"] < 2:
+            raise CommandError("--partitions must be at least 2.")
+
+        table = Document._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            [(relkind,)] = self.fetch(
+                cursor,
+                "SELECT relkind FROM pg_class WHERE oid = %s::regclass",
+                [table],
+            )
+            if relkind == "p":
+                raise CommandError(f"{table} is already partitioned.")
+
+            statements = self.build_statements(cursor, options["partitions"])
+            if options["dry_run"]:
+                for statement in statements:
+                    self.stdout.write(f"{statement};")
+                transaction.set_rollback(True)
+                return
+            for statement in statements:
+                cursor.execute(statement)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Partitioned {table} into {options['partitions']} hash partitions."
+            )
+        )
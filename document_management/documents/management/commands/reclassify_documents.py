@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from documents.changes import record_change
+from documents.classifier import classify_texts, load_classifier
+from documents.extraction import detect_document_type
+from documents.models import Document, DocumentChange
+from documents.pages import with_text
+
+
+class Command(BaseCommand):
+    help = "Re-run document classification over existing documents in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--only-unknown",
+            action="store_true",
+            help="Only reclassify documents currently typed as Unknown.",
+        )
+
+    def handle(self, *args, **options):
+        if load_classifier() is None:
+            self.stderr.write("No trained model found; using keyword rules only.")
+
+        documents = with_text(
+            Document.objects.order_by("id").only(
+                "id", "uuid", "text", "doc_type", "uploaded_by_id"
+            )
+        )
+        if options["only_unknown"]:
+            documents = documents.filter(doc_type="Unknown")
+
+        last_id = 0
+        processed = changed = 0
+        while True:
+            batch = list(documents.filter(id__gt=last_id)[: options["batch_size"]])
+            if not batch:
+                break
+            texts = [document.full_text for document in batch]
+            doc_types = classify_texts(
+                texts, [detect_document_type(text) for text in texts]
+            )
+            updated = []
+            for document, doc_type in zip(batch, doc_types):
+                if document.doc_type != doc_type:
+                    document.doc_type = doc_type
+                    updated.append(document)
+            with transaction.atomic():
+                Document.objects.bulk_update(updated, ["doc_type"])
+                for document in updated:
+                    record_change(
+                        document.uploaded_by_id, DocumentChange.UPDATE, document.uuid
+                    )
+            last_id = batch[-1].id
+            processed += len(batch)
+            changed += len(updated)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Reclassified {changed} of {processed} documents.")
+        )
@@ -0,0 +1,84 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.classifier import HashedTfidfClassifier, numpy_available
+from documents.extraction import detect_document_type
+from documents.models import Document
+from documents.pages import with_text
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the hashed TF-IDF document classifier from labeled documents "
+        "and report accuracy and throughput against the keyword rules."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", default=str(settings.DOCUMENT_CLASSIFIER_PATH)
+        )
+        parser.add_argument("--holdout", type=float, default=0.2)
+        parser.add_argument("--n-features", type=int, default=2**18)
+        parser.add_argument("--max-iter", type=int, default=200)
+        parser.add_argument("--regularization", type=float, default=1e-4)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not numpy_available():
+            raise CommandError("Training the classifier requires numpy and scipy.")
+
+        rows = [
+            (document.full_text, document.doc_type)
+            for document in with_text(
+                Document.objects.exclude(doc_type="Unknown").only("text", "doc_type")
+            )
+        ]
+        if len({label for _, label in rows}) < 2:
+            raise CommandError("Need labeled documents of at least two types.")
+
+        random.Random(options["seed"]).shuffle(rows)
+        split = max(1, int(len(rows) * options["holdout"]))
+        test, train = rows[:split], rows[split:]
+        if not train:
+            raise CommandError("Not enough labeled documents to train on.")
+
+        started = time.perf_counter()
+        model = HashedTfidfClassifier(n_features=options["n_features"]).fit(
+            [text for text, _ in train],
+            [label for _, label in train],
+            regularization=options["regularization"],
+            max_iter=options["max_iter"],
+        )
+        self.stdout.write(
+            f"Trained on {len(train)} documents in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+
+        texts = [text for text, _ in test]
+        labels = [label for _, label in test]
+
+        started = time.perf_counter()
+        probabilities = model.predict_proba(texts)
+        model_seconds = time.perf_counter() - started
+        predicted = [model.classes[i] for i in probabilities.argmax(axis=1)]
+
+        started = time.perf_counter()
+        rules = [detect_document_type(text) for text in texts]
+        rules_seconds = time.perf_counter() - started
+
+        for name, predictions, seconds in [
+            ("model", predicted, model_seconds),
+            ("rules", rules, rules_seconds),
+        ]:
+            correct = sum(p == label for p, label in zip(predictions, labels))
+            self.stdout.write(
+                f"{name}: accuracy {correct / len(labels):.3f} "
+                f"on {len(labels)} held-out documents, "
+                f"{len(labels) / max(seconds, 1e-9):,.0f} docs/sec"
+            )
+
+        model.save(options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Saved model to {options['output']}"))
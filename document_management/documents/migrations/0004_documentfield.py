@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentField',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('passport_number', 'Passport Number'), ('account_number', 'Account Number'), ('taxpayer_id', 'Taxpayer ID'), ('id_number', 'ID Number')], max_length=32)),
+                ('value', models.CharField(max_length=64)),
+                ('document', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='fields', to='documents.document')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_fields', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='documentfield',
+            index=models.Index(fields=['user', 'field', 'value'], name='document_field_lookup_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='documentfield',
+            constraint=models.UniqueConstraint(fields=('document', 'field', 'value'), name='unique_document_field_value'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:52
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_documentpage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['uploaded_by', 'id'], name='document_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['uploaded_by', 'doc_type', 'id'], name='document_user_type_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['uploaded_by', 'created_at', 'id'], name='document_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['uploaded_by', 'doc_type', 'created_at', 'id'], name='document_user_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['uploaded_by', 'pages', 'id'], name='document_user_pages_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['uploaded_by', 'doc_type', 'pages', 'id'], name='document_user_type_pages_idx'),
+        ),
+    ]
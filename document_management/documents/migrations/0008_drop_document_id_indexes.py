@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:46
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_document_timestamps'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='document',
+            name='document_user_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='document',
+            name='document_user_type_id_idx',
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 import uuid
@@ -51,6 +52,161 @@ class Document(models.Model):
     tags = models.JSONField()
     doc_type = models.CharField(max_length=50, choices=DOC_TYPE_CHOICES)
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="documents")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # One index per sort column and doc_type filter accepted by list/
+        # (see documents.listing), each ending in id as the tiebreaker.
+        indexes = [
+            models.Index(fields=['uploaded_by', 'created_at', 'id'], name='document_user_created_idx'),
+            models.Index(
+                fields=['uploaded_by', 'doc_type', 'created_at', 'id'],
+                name='document_user_type_created_idx',
+            ),
+            models.Index(fields=['uploaded_by', 'pages', 'id'], name='document_user_pages_idx'),
+            models.Index(
+                fields=['uploaded_by', 'doc_type', 'pages', 'id'],
+                name='document_user_type_pages_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.doc_type} - {self.id} ({self.uploaded_by.email})"
+
+    def iter_text(self):
+        # Documents uploaded before page chunking keep their text inline;
+        # newer ones leave it empty and store it in DocumentPage rows.
+        if self.text:
+            yield self.text
+            return
+        if 'chunks' in getattr(self, '_prefetched_objects_cache', {}):
+            yield from (chunk.text for chunk in self.chunks.all())
+            return
+        # Read from the database the document came from: streamed responses
+        # consume this after the view, and any replica routing, has returned.
+        chunks = self.chunks.using(self._state.db).order_by('page_no')
+        yield from chunks.values_list('text', flat=True).iterator()
+
+    @property
+    def full_text(self):
+        return ''.join(self.iter_text())
+
+class RevokedToken(models.Model):
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.jti} (expires {self.expires_at})"
+
+class ChangeSequence(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="change_sequence"
+    )
+    last_seq = models.BigIntegerField(default=0)
+    compacted_seq = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.last_seq}"
+
+class DocumentChange(models.Model):
+    INSERT = 'insert'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (INSERT, 'Insert'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="document_changes")
+    seq = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    document_uuid = models.UUIDField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'seq'], name='unique_change_seq_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}#{self.seq} {self.action} {self.document_uuid}"
+
+class ChangeCursor(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="change_cursors")
+    client_id = models.CharField(max_length=64)
+    seq = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_id'], name='unique_change_cursor_per_client'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}/{self.client_id}: {self.seq}"
+
+class DocumentField(models.Model):
+    FIELD_CHOICES = [
+        ('passport_number', 'Passport Number'),
+        ('account_number', 'Account Number'),
+        ('taxpayer_id', 'Taxpayer ID'),
+        ('id_number', 'ID Number'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="document_fields")
+    # No database-level constraint so that the documents table can be
+    # hash-partitioned (see partition_documents); deletes cascade in the ORM.
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, related_name="fields", db_constraint=False
+    )
+    field = models.CharField(max_length=32, choices=FIELD_CHOICES)
+    value = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'field', 'value'], name='document_field_lookup_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['document', 'field', 'value'], name='unique_document_field_value'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.field}={self.value} ({self.document_id})"
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    # Null until the first request finishes; concurrent duplicates wait on it.
+    status_code = models.IntegerField(null=True)
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key}"
+
+class DocumentPage(models.Model):
+    # No database-level constraint, as for DocumentField.
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, related_name="chunks", db_constraint=False
+    )
+    page_no = models.PositiveIntegerField()
+    text = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'page_no'], name='unique_document_page'),
+        ]
+
+    def __str__(self):
+        return f"{self.document_id} p.{self.page_no}"
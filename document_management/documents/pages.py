@@ -0,0 +1,135 @@
+"""
+Per-page storage of document text.
+
+Text is split into one DocumentPage row per page at upload. Text with form
+feeds is split on them, each chunk keeping its trailing form feed so that
+joining the chunks gives back the original text; the number of chunks then
+follows the form feeds and may differ from ``pages``. Text without form
+feeds is cut into ``pages`` chunks whose lengths differ by at most one
+character, the longer ones first; text shorter than ``pages`` characters
+gets one chunk per character. Pages up to ``document.pages`` that have no
+row are read as empty, so no padding rows are stored.
+"""
+
+from contextlib import nullcontext
+
+from django.db.models import Prefetch
+
+from .models import DocumentPage
+from .querybudget import unbudgeted
+
+
+STORE_BATCH_CHARACTERS = 1_000_000
+
+STORE_BATCH_ROWS = 1000
+
+
+def iter_pages(chunks, pages, length, paged):
+    """Split text arriving as ``chunks`` into page chunks, one page at a time.
+
+    ``length`` is the total number of characters and ``paged`` whether the
+    text contains a form feed; both are needed before the first page can
+    be cut.
+    """
+    current = []
+    if paged:
+        for chunk in chunks:
+            *complete, rest = chunk.split("\f")
+            for part in complete:
+                current.append(part)
+                yield "".join(current) + "\f"
+                current = []
+            current.append(rest)
+        last = "".join(current)
+        if last:
+            yield last
+        return
+    pages = min(pages, length)
+    if not pages:
+        return
+    base, extra = divmod(length, pages)
+    cut = 0
+
+    def size():
+        return base + (cut < extra)
+
+    filled = 0
+    for chunk in chunks:
+        start = 0
+        while start < len(chunk):
+            piece = chunk[start : start + size() - filled]
+            start += len(piece)
+            current.append(piece)
+            filled += len(piece)
+            if filled == size():
+                yield "".join(current)
+                current, filled, cut = [], 0, cut + 1
+    if current:
+        yield "".join(current)
+
+
+def split_pages(text, pages):
+    return list(iter_pages([text], pages, len(text), "\f" in text))
+
+
+def page_count(document):
+    """The number of readable pages.
+
+    That is ``document.pages``, or more if the text has more form-feed
+    pages than were declared.
+    """
+    if document.text:
+        stored = len(split_pages(document.text, document.pages))
+    else:
+        stored = document.chunks.count()
+    return max(document.pages, stored)
+
+
+def page_text(chunk):
+    return chunk[:-1] if chunk.endswith("\f") else chunk
+
+
+def store_pages(document, chunks):
+    """Insert page ``chunks`` in batches.
+
+    A batch is flushed once it holds STORE_BATCH_ROWS rows or about
+    STORE_BATCH_CHARACTERS characters, whichever comes first.
+    """
+    batch, size, batches = [], 0, 0
+
+    def insert():
+        # The number of batches follows the size of the document, so only
+        # the first one counts toward the view's query budget.
+        with unbudgeted() if batches else nullcontext():
+            DocumentPage.objects.bulk_create(batch)
+
+    for page_no, chunk in enumerate(chunks, start=1):
+        batch.append(DocumentPage(document=document, page_no=page_no, text=chunk))
+        size += len(chunk)
+        if size >= STORE_BATCH_CHARACTERS or len(batch) >= STORE_BATCH_ROWS:
+            insert()
+            batch, size, batches = [], 0, batches + 1
+    insert()
+
+
+def with_text(queryset, prefix=""):
+    """Prefetch the page chunks that ``Document.iter_text`` reads."""
+    return queryset.prefetch_related(
+        Prefetch(f"{prefix}chunks", queryset=DocumentPage.objects.order_by("page_no"))
+    )
+
+
+def read_pages(document, first, last):
+    """Return ``[(page_no, text)]`` for the pages in ``first..last``.
+
+    Pages without a stored chunk are returned as empty text.
+    """
+    if document.text:
+        chunks = split_pages(document.text, document.pages)[first - 1 : last]
+        stored = enumerate(chunks, start=first)
+    else:
+        stored = DocumentPage.objects.filter(
+            document=document, page_no__gte=first, page_no__lte=last
+        ).values_list("page_no", "text")
+    texts = {page_no: page_text(chunk) for page_no, chunk in stored}
+    return [(page_no, texts.get(page_no, "")) for page_no in range(first, last + 1)]
@@ -0,0 +1,150 @@
+"""
+Account validation and bulk user creation.
+
+``bulk_create_users`` validates a batch of rows up front, checks the
+valid emails against the database in one IN query, hashes the passwords
+across a process pool and inserts the users with bulk_create. Problems
+are reported per row instead of failing the whole batch.
+"""
+
+import os
+import re
+import time
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+User = get_user_model()
+
+# Below this many passwords, starting worker processes costs more than it saves.
+MIN_PARALLEL_PASSWORDS = 8
+
+
+def validate_user_email(email):
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise ValueError("Invalid email format")
+
+
+def validate_password_strength(password):
+    password_regex = re.compile(r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d).{8,}$")
+    if not password_regex.match(password):
+        raise ValueError(
+            "Password must be at least 8 characters long, contain at least one uppercase letter, one lowercase letter, and one digit."
+        )
+
+
+def _setup_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _hash_chunk(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash ``passwords`` with the default hasher, in parallel when worthwhile."""
+    workers = workers or settings.BULK_SIGNUP_HASH_WORKERS or os.cpu_count() or 1
+    workers = min(workers, len(passwords) // MIN_PARALLEL_PASSWORDS)
+    if workers <= 1:
+        return _hash_chunk(passwords)
+    # Imported here: multiprocessing is only needed by bulk imports.
+    from concurrent.futures import ProcessPoolExecutor
+
+    size = -(-len(passwords) // (workers * 4))
+    chunks = [passwords[i : i + size] for i in range(0, len(passwords), size)]
+    with ProcessPoolExecutor(workers, initializer=_setup_worker) as pool:
+        return [hashed for chunk in pool.map(_hash_chunk, chunks) for hashed in chunk]
+
+
+class BulkResult:
+    def __init__(self):
+        self.created = []
+        self.errors = []
+        self.elapsed = 0.0
+
+    def error(self, row, email, message):
+        self.errors.append({"row": row, "email": email, "error": message})
+
+    @property
+    def users_per_second(self):
+        return len(self.created) / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "created": len(self.created),
+            "failed": len(self.errors),
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "elapsed_seconds": round(self.elapsed, 3),
+            "users_per_second": round(self.users_per_second, 1),
+        }
+
+
+def bulk_create_users(rows, workers=None, start=1):
+    """
+    Create users from ``rows`` of ``{"email": ..., "password": ...}``.
+
+    Rows are numbered from ``start`` in the returned errors.
+    """
+    started = time.perf_counter()
+    result = BulkResult()
+
+    valid = {}
+    for row, data in enumerate(rows, start=start):
+        email = data.get("email") if isinstance(data, dict) else None
+        password = data.get("password") if isinstance(data, dict) else None
+        if not isinstance(email, str) or not isinstance(password, str):
+            result.error(row, email, "Email and password are required")
+            continue
+        try:
+            validate_user_email(email)
+            validate_password_strength(password)
+        except ValueError as e:
+            result.error(row, email, str(e))
+            continue
+        email = User.objects.normalize_email(email)
+        if email in valid:
+            result.error(row, email, "Duplicate email in batch")
+            continue
+        valid[email] = (row, password)
+
+    existing = set(
+        User.objects.filter(email__in=list(valid)).values_list("email", flat=True)
+    )
+    for email in existing:
+        result.error(valid.pop(email)[0], email, "Email already registered")
+
+    emails = list(valid)
+    hashes = hash_passwords([valid[email][1] for email in emails], workers)
+    users = [User(email=email, password=hashed) for email, hashed in zip(emails, hashes)]
+
+    # Emails registered between the check and the insert make the batch
+    # fail; drop them and retry the rest.
+    while users:
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users, batch_size=1000)
+            break
+        except IntegrityError:
+            taken = set(
+                User.objects.filter(
+                    email__in=[user.email for user in users]
+                ).values_list("email", flat=True)
+            )
+            if not taken:
+                raise
+            for email in taken:
+                result.error(valid[email][0], email, "Email already registered")
+            users = [user for user in users if user.email not in taken]
+
+    result.created = [user.email for user in users]
+    result.elapsed = time.perf_counter() - started
+    return result
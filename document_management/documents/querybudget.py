@@ -0,0 +1,164 @@
+"""
+Per-view query budgets and N+1 detection.
+
+Views declare the most queries one request may run with ``@query_budget``.
+QueryBudgetMiddleware counts the queries run on every connection while such
+a view handles a request. It also groups them by SQL shape: the SQL with
+numbers and the lengths of IN and VALUES lists normalized. A budget overrun,
+or a shape repeated QUERY_BUDGET_REPEAT_THRESHOLD times (the usual sign of
+an N+1 loop), is logged with the application frames that issued the
+repeated query. With QUERY_BUDGET_STRICT, which the test settings turn on,
+it raises QueryBudgetExceeded instead. Nothing is recorded unless
+QUERY_BUDGET_ENABLED is set.
+
+Savepoint statements are not counted. Work whose query count grows with the
+input by design, such as polling, can be wrapped in ``unbudgeted()``.
+"""
+
+import logging
+import os
+import re
+import sys
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+_budgets = {}
+
+_recorder = ContextVar("query_budget_recorder", default=None)
+
+SAVEPOINT_PATTERN = re.compile(
+    r"\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b", re.IGNORECASE
+)
+
+STACK_DEPTH = 5
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the most queries one request to the decorated view may run."""
+
+    def decorator(view):
+        # api_view() keeps the function's module and name on the view it
+        # returns, which is what the middleware resolves, so budgets are
+        # registered under those rather than attached to the function.
+        _budgets[(view.__module__, view.__name__)] = max_queries
+        return view
+
+    return decorator
+
+
+def get_budget(view):
+    return _budgets.get((view.__module__, view.__name__))
+
+
+def sql_shape(sql):
+    shape = re.sub(r"\((?:%s, )*%s\)", "(%s...)", sql)
+    shape = re.sub(r"\(%s\.\.\.\)(?:, \(%s\.\.\.\))+", "(%s...)", shape)
+    return re.sub(r"\b\d+\b", "N", shape)
+
+
+def _app_stack():
+    """The innermost application frames, skipping Django and this module."""
+    base_dir = str(settings.BASE_DIR)
+    frames = []
+    frame = sys._getframe(2)
+    while frame is not None and len(frames) < STACK_DEPTH:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(base_dir)
+            and filename != __file__
+            and f"{os.sep}site-packages{os.sep}" not in filename
+        ):
+            frames.append(
+                f"{os.path.relpath(filename, base_dir)}:{frame.f_lineno} "
+                f"in {frame.f_code.co_name}"
+            )
+        frame = frame.f_back
+    return frames
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.paused = 0
+        # shape -> [count, stack of the first repeat]
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.paused and not SAVEPOINT_PATTERN.match(sql):
+            self.count += 1
+            shape = sql_shape(sql)
+            entry = self.shapes.setdefault(shape, [0, None])
+            entry[0] += 1
+            if entry[0] == 2:
+                entry[1] = _app_stack()
+        return execute(sql, params, many, context)
+
+    def problems(self, budget):
+        problems = []
+        if self.count > budget:
+            problems.append(f"{self.count} queries, budget is {budget}")
+        for shape, (count, stack) in self.shapes.items():
+            if count >= settings.QUERY_BUDGET_REPEAT_THRESHOLD:
+                where = " <- ".join(stack) or "unknown"
+                problems.append(f"{count}x {shape[:200]} at {where}")
+        return problems
+
+
+@contextmanager
+def unbudgeted():
+    """Leave the queries run inside the block out of the current budget."""
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    recorder.paused += 1
+    try:
+        yield
+    finally:
+        recorder.paused -= 1
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return self.get_response(request)
+        budget = get_budget(match.func)
+        if budget is None:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+
+        problems = recorder.problems(budget)
+        if problems:
+            message = f"Query budget exceeded in {match.url_name}: " + "; ".join(
+                problems
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
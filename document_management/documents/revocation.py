@@ -0,0 +1,121 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import RevokedToken
+from .querybudget import unbudgeted
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        capacity = max(int(capacity), 1)
+        self.size = max(
+            int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8
+        )
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+class RevocationList:
+    """
+    Per-process view of the RevokedToken table.
+
+    Lookups hit the in-memory Bloom filter first and only fall through to
+    the database on a filter hit. The filter is refreshed incrementally
+    every TOKEN_REVOCATION_REFRESH_SECONDS, so a token revoked on another
+    worker is rejected here after at most that delay. Expired rows are
+    pruned every TOKEN_REVOCATION_PRUNE_SECONDS and the filter is rebuilt,
+    since entries cannot be removed from a Bloom filter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._filter = BloomFilter(
+                settings.TOKEN_REVOCATION_BLOOM_CAPACITY,
+                settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE,
+            )
+            self._watermark = None
+            self._next_refresh = 0.0
+            self._next_prune = (
+                time.monotonic() + settings.TOKEN_REVOCATION_PRUNE_SECONDS
+            )
+
+    def _load(self, since=None):
+        revoked = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        if since is not None:
+            # Rows are picked up by revocation time rather than by id so that
+            # transactions committing out of order are not skipped.
+            overlap = timedelta(
+                seconds=settings.TOKEN_REVOCATION_REFRESH_OVERLAP_SECONDS
+            )
+            revoked = revoked.filter(revoked_at__gte=since - overlap)
+        for jti in revoked.values_list("jti", flat=True).iterator():
+            self._filter.add(jti)
+
+    def prune(self):
+        RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.reset()
+
+    def refresh(self, force=False):
+        # Periodic maintenance is paid by whichever request comes along, so
+        # it is left out of that request's query budget.
+        now = time.monotonic()
+        if now >= self._next_prune:
+            with unbudgeted():
+                self.prune()
+        if not force and now < self._next_refresh:
+            return
+        with self._lock, unbudgeted():
+            if not force and time.monotonic() < self._next_refresh:
+                return
+            started_at = timezone.now()
+            self._load(since=self._watermark)
+            self._watermark = started_at
+            self._next_refresh = (
+                time.monotonic() + settings.TOKEN_REVOCATION_REFRESH_SECONDS
+            )
+
+    def is_revoked(self, jti):
+        self.refresh()
+        if jti not in self._filter:
+            return False
+        return RevokedToken.objects.filter(
+            jti=jti, expires_at__gt=timezone.now()
+        ).exists()
+
+    def revoke(self, token):
+        jti = token[settings.SIMPLE_JWT.get("JTI_CLAIM", "jti")]
+        expires_at = datetime.fromtimestamp(token["exp"], tz=dt_timezone.utc)
+        RevokedToken.objects.get_or_create(
+            jti=jti, defaults={"expires_at": expires_at}
+        )
+        with self._lock:
+            self._filter.add(jti)
+
+
+revocation_list = RevocationList()
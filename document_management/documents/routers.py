@@ -0,0 +1,147 @@
+import random
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .querybudget import unbudgeted
+
+_read_alias = ContextVar("read_alias", default=None)
+_pinned_user = ContextVar("pinned_user", default=None)
+
+PIN_COOKIE = "replica_pin"
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def pin_to_primary(user_id):
+    """
+    Send the user's reads to the primary for REPLICA_STICKY_SECONDS.
+
+    ReplicaPinMiddleware puts the pin on the current response as a signed,
+    timestamped cookie, so it holds on every worker without shared state.
+    """
+    if settings.DATABASE_REPLICAS:
+        _pinned_user.set(user_id)
+
+
+def is_pinned(request, user_id):
+    pinned = request.get_signed_cookie(
+        PIN_COOKIE, default=None, max_age=settings.REPLICA_STICKY_SECONDS
+    )
+    return pinned == str(user_id)
+
+
+class ReplicaPinMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _pinned_user.set(None)
+        try:
+            response = self.get_response(request)
+            user_id = _pinned_user.get()
+        finally:
+            _pinned_user.reset(token)
+        if user_id is not None:
+            response.set_signed_cookie(
+                PIN_COOKIE,
+                str(user_id),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+def _check_replica(alias):
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return True
+    except Exception:
+        return False
+
+
+def mark_unhealthy(alias):
+    with _health_lock:
+        _health[alias] = (False, time.monotonic())
+
+
+def replica_is_healthy(alias):
+    healthy, checked_at = _health.get(alias, (None, 0.0))
+    if time.monotonic() - checked_at < settings.REPLICA_HEALTH_CHECK_SECONDS:
+        return healthy
+    # Like the revocation-list refresh, the periodic check is paid by
+    # whichever request comes along and is left out of its query budget.
+    with unbudgeted():
+        healthy = _check_replica(alias)
+    with _health_lock:
+        _health[alias] = (healthy, time.monotonic())
+    return healthy
+
+
+def choose_replica():
+    healthy = [
+        alias for alias in settings.DATABASE_REPLICAS if replica_is_healthy(alias)
+    ]
+    return random.choice(healthy) if healthy else None
+
+
+def read_from_replica(view):
+    """
+    Route the ORM reads made by a read-only view to a healthy replica.
+
+    Requests from a user who wrote within the last REPLICA_STICKY_SECONDS
+    stay on the primary so they always see their own writes. If the replica
+    fails mid-request it is marked unhealthy and the view is re-run against
+    the primary.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        user_id = request.user.pk if request.user.is_authenticated else None
+        if (
+            not settings.DATABASE_REPLICAS
+            or user_id is None
+            or is_pinned(request, user_id)
+        ):
+            return view(request, *args, **kwargs)
+
+        alias = choose_replica()
+        if alias is None:
+            return view(request, *args, **kwargs)
+
+        token = _read_alias.set(alias)
+        try:
+            return view(request, *args, **kwargs)
+        except DatabaseError:
+            mark_unhealthy(alias)
+        finally:
+            _read_alias.reset(token)
+        # The failed attempt's queries were already counted.
+        with unbudgeted():
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -2,6 +2,13 @@ from rest_framework import serializers
 from .models import Document
 
 class DocumentSerializer(serializers.ModelSerializer):
+    text = serializers.CharField(source='full_text', read_only=True)
+
+    class Meta:
+        model = Document
+        fields = ['uuid','pages', 'text', 'tags', 'doc_type', 'created_at', 'updated_at']
+
+class DocumentMetadataSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
-        fields = ['uuid','pages', 'text', 'tags', 'doc_type']
+        fields = ['uuid', 'pages', 'tags', 'doc_type', 'created_at', 'updated_at']
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Document
+from .routers import pin_to_primary
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def pin_writer_to_primary(sender, instance, **kwargs):
+    pin_to_primary(instance.uploaded_by_id)
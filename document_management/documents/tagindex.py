@@ -0,0 +1,187 @@
+import bisect
+import heapq
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Document
+
+# Rough per-tag cost of the list slot, dict entry and count on top of the
+# string itself, used to keep the cache under TAG_INDEX_MAX_BYTES.
+ENTRY_OVERHEAD_BYTES = 120
+
+
+def _string_tags(tags):
+    if not isinstance(tags, list):
+        return []
+    return [tag for tag in tags if isinstance(tag, str)]
+
+
+class TagIndex:
+    """A user's tags in sorted order with the number of documents using each."""
+
+    def __init__(self, counts=None):
+        self.counts = Counter(counts or {})
+        self.tags = sorted(self.counts)
+        self.size = sum(self._entry_size(tag) for tag in self.tags)
+
+    @staticmethod
+    def _entry_size(tag):
+        return sys.getsizeof(tag) + ENTRY_OVERHEAD_BYTES
+
+    def add(self, tag):
+        if tag not in self.counts:
+            bisect.insort(self.tags, tag)
+            self.size += self._entry_size(tag)
+        self.counts[tag] += 1
+
+    def remove(self, tag):
+        if self.counts.get(tag, 0) > 1:
+            self.counts[tag] -= 1
+        elif tag in self.counts:
+            del self.counts[tag]
+            del self.tags[bisect.bisect_left(self.tags, tag)]
+            self.size -= self._entry_size(tag)
+
+    def suggest(self, prefix, limit):
+        start = bisect.bisect_left(self.tags, prefix)
+        end = bisect.bisect_left(self.tags, prefix + "\U0010ffff", lo=start)
+        # Most used first; equal counts stay in alphabetical order.
+        return heapq.nlargest(
+            limit, self.tags[start:end], key=self.counts.__getitem__
+        )
+
+
+class TagIndexCache:
+    """
+    Per-process LRU of TagIndex objects, one per user.
+
+    An index is built from the user's documents on first use and then kept
+    current by ``record_tag_change``. Every write bumps a version stamp in
+    the default cache before it commits, and applies its change to this
+    process's index once it has committed. The change is applied only to
+    an index built from the version just before that bump, which cannot
+    contain the write; any other index is discarded. An index whose
+    version does not match the stamp missed a write made by another worker
+    and is rebuilt on the next read. Least recently used indexes are
+    evicted once their estimated size exceeds TAG_INDEX_MAX_BYTES.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._indexes = OrderedDict()
+            self._size = 0
+
+    def _version_key(self, user_id):
+        return f"tag-index-version:{user_id}"
+
+    def _version(self, user_id):
+        # A stamp lost from the cache is recreated from the clock, so it
+        # cannot match the version of an index built before it was lost.
+        key = self._version_key(user_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, time.time_ns() // 1000, None)
+            version = cache.get(key)
+        return version
+
+    def _discard(self, user_id):
+        entry = self._indexes.pop(user_id, None)
+        if entry is not None:
+            self._size -= entry[1].size
+
+    def _evict(self):
+        while self._size > settings.TAG_INDEX_MAX_BYTES and len(self._indexes) > 1:
+            _, (_, index) = self._indexes.popitem(last=False)
+            self._size -= index.size
+
+    def _build(self, user_id):
+        counts = Counter()
+        for tags in (
+            Document.objects.filter(uploaded_by_id=user_id)
+            .values_list("tags", flat=True)
+            .iterator()
+        ):
+            counts.update(set(_string_tags(tags)))
+        return TagIndex(counts)
+
+    def get(self, user_id):
+        version = self._version(user_id)
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            if entry is not None and entry[0] == version:
+                self._indexes.move_to_end(user_id)
+                return entry[1]
+
+        index = self._build(user_id)
+        # Writes bump the stamp before they commit. If it did not move while
+        # the documents were read, every write they contain bumped it before
+        # the first read and every later bump belongs to a write they do
+        # not contain. Otherwise the index is used once but not kept.
+        if self._version(user_id) != version:
+            return index
+        with self._lock:
+            self._discard(user_id)
+            self._indexes[user_id] = (version, index)
+            self._size += index.size
+            self._evict()
+        return index
+
+    def suggest(self, user_id, prefix, limit):
+        index = self.get(user_id)
+        with self._lock:
+            return [(tag, index.counts[tag]) for tag in index.suggest(prefix, limit)]
+
+    def bump(self, user_id):
+        """Move the version stamp on; call before the write commits."""
+        self._version(user_id)
+        try:
+            return cache.incr(self._version_key(user_id))
+        except ValueError:
+            return None
+
+    def apply(self, user_id, version, added, removed):
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            if entry is None:
+                return
+            if version is None or entry[0] != version - 1:
+                self._discard(user_id)
+                return
+            index = entry[1]
+            self._size -= index.size
+            for tag in removed:
+                index.remove(tag)
+            for tag in added:
+                index.add(tag)
+            self._size += index.size
+            self._indexes[user_id] = (version, index)
+            self._evict()
+
+
+tag_indexes = TagIndexCache()
+
+
+def record_tag_change(user_id, added=(), removed=()):
+    """
+    Apply a document's tag change to the index once the write commits.
+
+    Call it inside the write's transaction, so the stamp moves first.
+    """
+    added = set(_string_tags(added))
+    removed = set(_string_tags(removed))
+    added, removed = added - removed, removed - added
+    if added or removed:
+        version = tag_indexes.bump(user_id)
+        transaction.on_commit(
+            lambda: tag_indexes.apply(user_id, version, added, removed)
+        )
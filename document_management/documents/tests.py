@@ -1,9 +1,50 @@
+import io
+import os
+import shutil
+import tempfile
 import uuid
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import Document
+from datetime import timedelta
+from unittest import mock, skipIf, skipUnless
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+from .classifier import classify_texts, numpy_available
+from .extraction import TextAnalyzer, analyze_text
+from .listing import ORDERINGS, filter_documents
+from .pages import split_pages
+from .provisioning import bulk_create_users, hash_passwords
+from .querybudget import (
+    QueryBudgetExceeded,
+    QueryRecorder,
+    get_budget,
+    sql_shape,
+    unbudgeted,
+)
+from .models import (
+    ChangeCursor,
+    Document,
+    DocumentChange,
+    DocumentField,
+    DocumentPage,
+    IdempotencyKey,
+    RevokedToken,
+)
+from .revocation import BloomFilter, revocation_list
+from .uploads import UploadTooLarge, spool_stream
+from . import admission, routers, urls, views
+from .tagindex import TagIndex, record_tag_change, tag_indexes
+from .changes import record_change
 
 User = get_user_model()
 
@@ -330,3 +371,1596 @@ class DocuVaultTest(APITestCase):
             f"Document with id {document.uuid} not found.",
             response.data["error"],
         )
+
+
+class TokenRevocationTest(APITestCase):
+
+    def setUp(self):
+        revocation_list.reset()
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        self.login_url = reverse("login")
+        self.logout_url = reverse("logout")
+        self.list_documents_url = reverse("list_documents")
+
+    def login(self):
+        response = self.client.get(
+            self.login_url, HTTP_EMAIL="test@example.com", HTTP_PASSWORD="Test@1234"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_bloom_filter_membership(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+        self.assertTrue(all(f"jti-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other-{i}" in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access_token']}")
+        response = self.client.post(
+            self.logout_url,
+            data={"refresh_token": tokens["refresh_token"]},
+            format="json",
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(RevokedToken.objects.count(), 2)
+
+        response = self.client.get(
+            self.list_documents_url, HTTP_EMAIL="test@example.com"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data["detail"], "Token has been revoked")
+
+    def test_logout_requires_refresh_token(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access_token']}")
+        response = self.client.post(
+            self.logout_url, data={}, format="json", HTTP_EMAIL="test@example.com"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Refresh token is required", response.data["error"])
+
+    def test_other_sessions_stay_valid_after_logout(self):
+        first = self.login()
+        second = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {first['access_token']}")
+        self.client.post(
+            self.logout_url,
+            data={"refresh_token": first["refresh_token"]},
+            format="json",
+            HTTP_EMAIL="test@example.com",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {second['access_token']}")
+        response = self.client.get(
+            self.list_documents_url, HTTP_EMAIL="test@example.com"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_revocation_from_another_worker_is_picked_up_on_refresh(self):
+        revocation_list.refresh(force=True)
+        RevokedToken.objects.create(
+            jti="revoked-elsewhere", expires_at=timezone.now() + timedelta(hours=1)
+        )
+        self.assertFalse(revocation_list.is_revoked("revoked-elsewhere"))
+        revocation_list.refresh(force=True)
+        self.assertTrue(revocation_list.is_revoked("revoked-elsewhere"))
+
+    def test_prune_removes_expired_entries(self):
+        RevokedToken.objects.create(
+            jti="expired", expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        RevokedToken.objects.create(
+            jti="active", expires_at=timezone.now() + timedelta(hours=1)
+        )
+        revocation_list.prune()
+        self.assertEqual(
+            list(RevokedToken.objects.values_list("jti", flat=True)), ["active"]
+        )
+        self.assertFalse(revocation_list.is_revoked("expired"))
+        self.assertTrue(revocation_list.is_revoked("active"))
+
+
+class ConnectionHealthCheckTest(APITestCase):
+
+    def setUp(self):
+        from .backends.postgresql.base import DatabaseWrapper
+
+        self.wrapper = DatabaseWrapper(
+            {
+                **connection.settings_dict,
+                "CONN_MAX_AGE": 600,
+                "CONN_HEALTH_CHECKS": True,
+            },
+            "health",
+        )
+        self.addCleanup(self.wrapper.close)
+        self.wrapper.ensure_connection()
+
+    def query(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            return cursor.fetchone()[0]
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    def test_dropped_connection_is_replaced_on_first_use(self):
+        pid = self.query()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", [pid])
+        self.wrapper.close_if_unusable_or_obsolete()  # request_started
+        self.assertNotEqual(self.query(), pid)
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    def test_pings_only_on_first_use_in_a_request(self):
+        self.wrapper.close_if_unusable_or_obsolete()
+        with mock.patch.object(
+            self.wrapper, "is_usable", wraps=self.wrapper.is_usable
+        ) as is_usable:
+            self.wrapper.close_if_unusable_or_obsolete()
+            is_usable.assert_not_called()
+            self.query()
+            self.query()
+            is_usable.assert_called_once_with()
+
+
+def fail_document_queries(execute, sql, params, many, context):
+    if "documents_document" in sql:
+        raise OperationalError("replica went away")
+    return execute(sql, params, many, context)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTest(APITestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        routers._health.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        self.router = routers.ReplicaRouter()
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="test@example.com", HTTP_PASSWORD="Test@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+        # The primary has one document and the replica, which lags, has
+        # none, so every response shows which database it was read from.
+        self.replicate(self.user)
+        Document.objects.create(
+            pages=1, text="Sample", tags=[], doc_type="ID Card", uploaded_by=self.user
+        )
+        cache.clear()
+
+    def replicate(self, *objects):
+        for obj in objects:
+            obj.save(using="replica", force_insert=True)
+
+    def list_count(self):
+        response = self.client.get(
+            reverse("list_documents"), HTTP_EMAIL="test@example.com"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["total_count"]
+
+    def test_reads_outside_replica_views_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Document), "default")
+        self.assertEqual(self.router.db_for_write(Document), "default")
+
+    def test_reads_go_to_healthy_replica(self):
+        self.assertEqual(self.list_count(), 0)
+        self.assertTrue(routers.replica_is_healthy("replica"))
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(Document.objects.using("replica").count(), 0)
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_recent_writer_is_pinned_to_primary(self):
+        response = self.client.post(
+            reverse("upload_document"),
+            data={"text": "Sample", "pages": 1, "tags": []},
+            format="json",
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        # The pin is carried by the client, not kept by this worker.
+        cache.clear()
+        self.assertEqual(self.list_count(), 2)
+
+        # Once the pin has outlived REPLICA_STICKY_SECONDS it is ignored.
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            self.assertEqual(self.list_count(), 0)
+
+    def test_pin_is_scoped_to_its_user(self):
+        other = User.objects.create_user(
+            email="other@example.com", password="Other@1234"
+        )
+        signer = signing.get_cookie_signer(salt=routers.PIN_COOKIE)
+        self.client.cookies[routers.PIN_COOKIE] = signer.sign(str(other.id))
+        self.assertEqual(self.list_count(), 0)
+
+    def test_new_account_is_pinned_to_primary(self):
+        self.client.credentials()
+        response = self.client.post(
+            reverse("signup"),
+            data={"email": "new@example.com", "password": "New@12345"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="new@example.com", HTTP_PASSWORD="New@12345"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+        response = self.client.get(
+            reverse("list_documents"), HTTP_EMAIL="new@example.com"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Without the pin the replica, which lacks the account, answers.
+        self.client.cookies.clear()
+        response = self.client.get(
+            reverse("list_documents"), HTTP_EMAIL="new@example.com"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        routers.mark_unhealthy("replica")
+        self.assertEqual(self.list_count(), 1)
+
+    def test_replica_error_mid_view_reruns_on_primary(self):
+        with connections["replica"].execute_wrapper(fail_document_queries):
+            self.assertEqual(self.list_count(), 1)
+        self.assertFalse(routers.replica_is_healthy("replica"))
+
+
+class PartitionDocumentsTest(APITestCase):
+
+    @skipIf(connection.vendor == "postgresql", "PostgreSQL supports partitioning")
+    def test_requires_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command("partition_documents")
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    def test_partitioned_table_keeps_data_and_serves_queries(self):
+        users = [
+            User.objects.create_user(email=f"user{i}@example.com", password="Test@1234")
+            for i in range(3)
+        ]
+        for i in range(12):
+            Document.objects.create(
+                pages=1,
+                text="Sample text",
+                tags=["sample"],
+                doc_type="ID Card",
+                uploaded_by=users[i % 3],
+            )
+
+        call_command("partition_documents", partitions=4, stdout=mock.Mock())
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relkind FROM pg_class WHERE oid = %s::regclass",
+                [Document._meta.db_table],
+            )
+            self.assertEqual(cursor.fetchone()[0], "p")
+        self.assertEqual(Document.objects.filter(uploaded_by=users[0]).count(), 4)
+        document = Document.objects.create(
+            pages=1, text="New", tags=["new"], doc_type="ID Card", uploaded_by=users[1]
+        )
+        self.assertEqual(
+            Document.objects.filter(
+                uploaded_by=users[1], tags__contains=["new"]
+            ).get(),
+            document,
+        )
+
+
+class ChangeFeedTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        self.changes_url = reverse("list_changes")
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="test@example.com", HTTP_PASSWORD="Test@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+
+    def upload(self, text="Passport number X1234567", tags=None):
+        response = self.client.post(
+            reverse("upload_document"),
+            data={"text": text, "pages": 1, "tags": tags or []},
+            format="json",
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["uuid"]
+
+    def get_changes(self, **params):
+        return self.client.get(
+            self.changes_url, data=params, HTTP_EMAIL="test@example.com"
+        )
+
+    def test_insert_update_and_delete_are_recorded_in_order(self):
+        document_uuid = self.upload()
+        self.client.put(
+            reverse("update_document", args=[document_uuid]),
+            data={"tags": ["travel"]},
+            format="json",
+            HTTP_EMAIL="test@example.com",
+        )
+        self.client.delete(
+            reverse("delete_document", args=[document_uuid]),
+            HTTP_EMAIL="test@example.com",
+        )
+
+        response = self.get_changes()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(c["seq"], c["action"]) for c in response.data["changes"]],
+            [(1, "insert"), (2, "update"), (3, "delete")],
+        )
+        self.assertIsNone(response.data["changes"][2]["document"])
+        self.assertEqual(response.data["last_seq"], 3)
+        self.assertFalse(response.data["has_more"])
+
+    def test_since_returns_only_deltas_in_batches(self):
+        for _ in range(3):
+            self.upload()
+        response = self.get_changes(since=1, limit=1)
+        self.assertEqual([c["seq"] for c in response.data["changes"]], [2])
+        self.assertTrue(response.data["has_more"])
+        self.assertEqual(response.data["changes"][0]["document"]["doc_type"], "Passport")
+        self.assertNotIn("text", response.data["changes"][0]["document"])
+
+        response = self.get_changes(since=response.data["last_seq"])
+        self.assertEqual([c["seq"] for c in response.data["changes"]], [3])
+        self.assertFalse(response.data["has_more"])
+
+    def test_sequences_are_per_user(self):
+        other = User.objects.create_user(
+            email="other@example.com", password="Other@1234"
+        )
+        record_change(other.id, DocumentChange.INSERT, uuid.uuid4())
+        record_change(other.id, DocumentChange.INSERT, uuid.uuid4())
+        self.upload()
+        response = self.get_changes()
+        self.assertEqual([c["seq"] for c in response.data["changes"]], [1])
+
+    def test_long_poll_returns_empty_batch_after_wait(self):
+        with override_settings(CHANGE_FEED_POLL_INTERVAL_SECONDS=0.01):
+            response = self.get_changes(wait=0.05)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["changes"], [])
+        self.assertEqual(response.data["last_seq"], 0)
+
+    def test_compaction_waits_for_all_known_cursors(self):
+        for _ in range(4):
+            self.upload()
+        self.get_changes(since=3, client="laptop")
+        self.get_changes(since=1, client="phone")
+        call_command("compact_changes", stdout=mock.Mock())
+        self.assertEqual(
+            list(DocumentChange.objects.values_list("seq", flat=True).order_by("seq")),
+            [2, 3, 4],
+        )
+
+        response = self.get_changes(since=0)
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual(response.data["last_seq"], 4)
+        response = self.get_changes(since=1, client="phone")
+        self.assertEqual([c["seq"] for c in response.data["changes"]], [2, 3, 4])
+
+    def test_stale_cursors_do_not_block_compaction(self):
+        for _ in range(2):
+            self.upload()
+        self.get_changes(since=0, client="abandoned")
+        ChangeCursor.objects.update(updated_at=timezone.now() - timedelta(days=365))
+        call_command("compact_changes", stdout=mock.Mock())
+        self.assertFalse(DocumentChange.objects.exists())
+        self.assertFalse(ChangeCursor.objects.exists())
+
+
+class FieldExtractionTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        self.lookup_url = reverse("lookup_documents")
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="test@example.com", HTTP_PASSWORD="Test@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+
+    def test_analyze_text_classifies_and_extracts_in_one_pass(self):
+        doc_type, fields = analyze_text(
+            "Monthly statement. Account Number: 1234-5678-90. Transaction history."
+        )
+        self.assertEqual(doc_type, "Bank Statement")
+        self.assertEqual(fields, [("account_number", "1234567890")])
+
+    def test_analyze_text_keeps_keyword_priority(self):
+        doc_type, fields = analyze_text("Taxpayer ID Number: 12-3456789")
+        self.assertEqual(doc_type, "ID Card")
+        self.assertIn(("taxpayer_id", "123456789"), fields)
+        self.assertEqual(analyze_text("nothing to see")[0], "Unknown")
+
+    def test_analyze_text_keeps_spaced_digit_groups(self):
+        _, fields = analyze_text("Account Number: 1234 5678 9012 on file")
+        self.assertEqual(fields, [("account_number", "123456789012")])
+
+    def test_analyze_text_ignores_keywords_inside_words(self):
+        _, fields = analyze_text("Valid number 12345")
+        self.assertEqual(fields, [])
+        _, fields = analyze_text("Valid ID number 12345")
+        self.assertEqual(fields, [("id_number", "12345")])
+
+    def test_upload_indexes_fields_and_lookup_finds_document(self):
+        response = self.client.post(
+            reverse("upload_document"),
+            data={"text": "Passport number: X1234567", "pages": 1, "tags": []},
+            format="json",
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(
+            self.lookup_url,
+            data={"field": "passport_number", "value": "x1234567"},
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["documents"]), 1)
+        self.assertEqual(response.data["documents"][0]["doc_type"], "Passport")
+
+    def test_lookup_is_scoped_to_user(self):
+        other = User.objects.create_user(
+            email="other@example.com", password="Other@1234"
+        )
+        document = Document.objects.create(
+            pages=1,
+            text="Account number 55554444",
+            tags=[],
+            doc_type="Bank Statement",
+            uploaded_by=other,
+        )
+        DocumentField.objects.create(
+            user=other, document=document, field="account_number", value="55554444"
+        )
+        response = self.client.get(
+            self.lookup_url,
+            data={"field": "account_number", "value": "55554444"},
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.data["documents"], [])
+
+    def test_lookup_rejects_unknown_field(self):
+        response = self.client.get(
+            self.lookup_url,
+            data={"field": "nationality", "value": "x"},
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_backfill_command_indexes_existing_documents(self):
+        Document.objects.create(
+            pages=1,
+            text="ID number: AB123456",
+            tags=[],
+            doc_type="ID Card",
+            uploaded_by=self.user,
+        )
+        call_command("backfill_document_fields", stdout=mock.Mock())
+        call_command("backfill_document_fields", stdout=mock.Mock())
+        self.assertEqual(
+            list(DocumentField.objects.values_list("field", "value")),
+            [("id_number", "AB123456")],
+        )
+
+
+@skipUnless(numpy_available(), "requires numpy and scipy")
+class DocumentClassifierTest(APITestCase):
+
+    TRAINING_TEXTS = {
+        "Bank Statement": "opening balance deposit withdrawal closing balance branch",
+        "Passport": "surname given names place of birth visa travel republic",
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        for doc_type, text in self.TRAINING_TEXTS.items():
+            Document.objects.bulk_create(
+                Document(
+                    pages=1,
+                    text=f"{text} page {i}",
+                    tags=[],
+                    doc_type=doc_type,
+                    uploaded_by=self.user,
+                )
+                for i in range(20)
+            )
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.model_path = os.path.join(directory, "classifier.npz")
+        settings_override = override_settings(DOCUMENT_CLASSIFIER_PATH=self.model_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command(
+            "train_classifier",
+            output=self.model_path,
+            n_features=2**12,
+            stdout=mock.Mock(),
+        )
+
+    def test_confident_predictions_override_keyword_rules(self):
+        self.assertEqual(
+            classify_texts(
+                ["deposit withdrawal closing balance", "visa surname travel"],
+                ["Unknown", "Unknown"],
+            ),
+            ["Bank Statement", "Passport"],
+        )
+
+    def test_low_confidence_falls_back_to_keyword_rules(self):
+        with override_settings(DOCUMENT_CLASSIFIER_THRESHOLD=1.01):
+            self.assertEqual(
+                classify_texts(["deposit withdrawal"], ["Unknown"]), ["Unknown"]
+            )
+
+    def test_without_model_keyword_rules_are_used(self):
+        with override_settings(DOCUMENT_CLASSIFIER_PATH=self.model_path + ".missing"):
+            self.assertEqual(classify_texts(["deposit"], ["ID Card"]), ["ID Card"])
+
+    def test_reclassify_command_updates_unknown_documents(self):
+        document = Document.objects.create(
+            pages=1,
+            text="opening balance and closing balance",
+            tags=[],
+            doc_type="Unknown",
+            uploaded_by=self.user,
+        )
+        call_command("reclassify_documents", only_unknown=True, stdout=mock.Mock())
+        document.refresh_from_db()
+        self.assertEqual(document.doc_type, "Bank Statement")
+        self.assertTrue(
+            DocumentChange.objects.filter(document_uuid=document.uuid).exists()
+        )
+
+
+class IdempotencyTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        self.upload_url = reverse("upload_document")
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="test@example.com", HTTP_PASSWORD="Test@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+
+    def upload(self, key, text="Account number 12345678"):
+        return self.client.post(
+            self.upload_url,
+            data={"text": text, "pages": 1, "tags": []},
+            format="json",
+            HTTP_EMAIL="test@example.com",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_first_response_without_inserting(self):
+        first = self.upload("retry-1")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        second = self.upload("retry-1")
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(str(second.data["uuid"]), str(first.data["uuid"]))
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_replay_survives_cache_eviction(self):
+        first = self.upload("retry-2")
+        cache.clear()
+        second = self.upload("retry-2")
+        self.assertEqual(second.data["uuid"], str(first.data["uuid"]))
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_key_reuse_with_different_body_is_rejected(self):
+        self.upload("retry-3")
+        response = self.upload("retry-3", text="Passport number X1234567")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_duplicate_waits_for_in_flight_request(self):
+        IdempotencyKey.objects.create(
+            user=self.user, key="in-flight", fingerprint="unused"
+        )
+        with override_settings(IDEMPOTENCY_WAIT_SECONDS=0.05):
+            response = self.upload("in-flight")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Document.objects.exists())
+
+    def test_abandoned_claim_is_taken_over_after_its_lease(self):
+        IdempotencyKey.objects.create(
+            user=self.user, key="abandoned", fingerprint="unused"
+        )
+        IdempotencyKey.objects.update(
+            created_at=timezone.now()
+            - timedelta(seconds=settings.IDEMPOTENCY_CLAIM_LEASE_SECONDS + 1)
+        )
+        response = self.upload("abandoned")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            IdempotencyKey.objects.get(key="abandoned").status_code,
+            status.HTTP_201_CREATED,
+        )
+
+    def test_key_is_released_when_the_worker_is_stopped(self):
+        with mock.patch(
+            "documents.views.analyze_text", side_effect=SystemExit(1)
+        ), self.assertRaises(SystemExit):
+            self.upload("killed")
+        self.assertFalse(IdempotencyKey.objects.filter(key="killed").exists())
+        response = self.upload("killed")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_expired_key_runs_the_request_again(self):
+        self.upload("retry-4")
+        cache.clear()
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        response = self.upload("retry-4")
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(Document.objects.count(), 2)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        call_command("prune_idempotency_keys", stdout=mock.Mock())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        for _ in range(2):
+            self.client.post(
+                self.upload_url,
+                data={"text": "Sample", "pages": 1, "tags": []},
+                format="json",
+                HTTP_EMAIL="test@example.com",
+            )
+        self.assertEqual(Document.objects.count(), 2)
+
+
+class AdmissionControlTest(APITestCase):
+
+    def setUp(self):
+        admission.local_buckets.clear()
+        admission.stats.clear()
+        self.addCleanup(admission.local_buckets.clear)
+        self.addCleanup(admission.stats.clear)
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        self.upload_url = reverse("upload_document")
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="test@example.com", HTTP_PASSWORD="Test@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+
+    def upload(self, text="Sample document"):
+        return self.client.post(
+            self.upload_url,
+            data={"text": text, "pages": 1, "tags": []},
+            format="json",
+            HTTP_EMAIL="test@example.com",
+        )
+
+    @override_settings(
+        ADMISSION_BUCKET_CAPACITY=3.5, ADMISSION_BUCKET_REFILL_PER_SECOND=0.5
+    )
+    def test_bucket_rejects_with_retry_after(self):
+        for _ in range(3):
+            self.assertEqual(self.upload().status_code, status.HTTP_201_CREATED)
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(Document.objects.count(), 3)
+
+    @override_settings(ADMISSION_BUCKET_CAPACITY=3, ADMISSION_BYTES_PER_TOKEN=100)
+    def test_cost_is_weighted_by_body_size(self):
+        self.assertEqual(self.upload("x" * 120).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            self.upload("x" * 120).status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(
+            self.upload("x" * 400).status_code,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    def test_buckets_are_per_user(self):
+        other = User.objects.create_user(
+            email="other@example.com", password="Other@1234"
+        )
+        with override_settings(ADMISSION_BUCKET_CAPACITY=1.5):
+            self.assertEqual(self.upload().status_code, status.HTTP_201_CREATED)
+            self.assertEqual(
+                self.upload().status_code, status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response = self.client.get(
+                reverse("login"),
+                HTTP_EMAIL="other@example.com",
+                HTTP_PASSWORD="Other@1234",
+            )
+            self.client.credentials(
+                HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+            )
+            response = self.client.post(
+                self.upload_url,
+                data={"text": "Sample", "pages": 1, "tags": []},
+                format="json",
+                HTTP_EMAIL=other.email,
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_in_flight_cap_rejects_with_503(self):
+        limit = settings.ADMISSION_CONTROL["upload_document"]["max_in_flight"]
+        for _ in range(limit):
+            admission.stats.enter("upload_document", limit)
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+        admission.stats.leave("upload_document")
+        self.assertEqual(self.upload().status_code, status.HTTP_201_CREATED)
+
+    @override_settings(ADMISSION_BUCKET_CAPACITY=1.5)
+    def test_rejected_for_load_costs_no_tokens(self):
+        limit = settings.ADMISSION_CONTROL["upload_document"]["max_in_flight"]
+        for _ in range(limit):
+            admission.stats.enter("upload_document", limit)
+        for _ in range(3):
+            self.assertEqual(
+                self.upload().status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        admission.stats.leave("upload_document")
+        self.assertEqual(self.upload().status_code, status.HTTP_201_CREATED)
+
+    def test_chunked_body_without_length_is_rejected(self):
+        response = self.client.post(
+            self.upload_url,
+            data="",
+            content_type="text/plain",
+            HTTP_EMAIL="test@example.com",
+            HTTP_TRANSFER_ENCODING="chunked",
+            CONTENT_LENGTH="",
+        )
+        self.assertEqual(response.status_code, status.HTTP_411_LENGTH_REQUIRED)
+
+    def test_counters_are_exposed_to_staff_only(self):
+        self.upload()
+        response = self.client.get(reverse("admission_stats"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("admission_stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["upload_document"]["admitted"], 1)
+        self.assertEqual(response.data["upload_document"]["in_flight"], 0)
+
+    @override_settings(ADMISSION_BUCKET_STORE="cache", ADMISSION_BUCKET_CAPACITY=1.5)
+    def test_shared_cache_store(self):
+        cache.clear()
+        self.assertEqual(self.upload().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.upload().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class DocumentPagesTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="test@example.com", HTTP_PASSWORD="Test@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+
+    def upload(self, text, pages):
+        response = self.client.post(
+            reverse("upload_document"),
+            data={"text": text, "pages": pages, "tags": []},
+            format="json",
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["uuid"]
+
+    def get_pages(self, document_uuid, **params):
+        return self.client.get(
+            reverse("document_pages", args=[document_uuid]),
+            data=params,
+            HTTP_EMAIL="test@example.com",
+        )
+
+    def test_split_pages(self):
+        self.assertEqual(split_pages("one\ftwo\fthree", 3), ["one\f", "two\f", "three"])
+        self.assertEqual(split_pages("one\ftwo\f", 2), ["one\f", "two\f"])
+        self.assertEqual(split_pages("abcdefg", 3), ["abc", "de", "fg"])
+        self.assertEqual(split_pages("x" * 9, 4), ["xxx", "xx", "xx", "xx"])
+        self.assertEqual(split_pages("abc", 5), ["a", "b", "c"])
+        self.assertEqual(len(split_pages("x" * 1000, 400)), 400)
+        self.assertEqual(len(split_pages("x" * 10, 200000)), 10)
+        for text, pages in [("a\f\fb", 3), ("abcdefg", 3), ("ab", 5)]:
+            self.assertEqual("".join(split_pages(text, pages)), text)
+
+    def test_every_page_of_uneven_text_is_readable(self):
+        document_uuid = self.upload("x" * 1000, 400)
+        self.assertEqual(DocumentPage.objects.count(), 400)
+        response = self.get_pages(document_uuid, **{"from": 350, "to": 351})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["page_texts"],
+            [{"page_no": 350, "text": "xx"}, {"page_no": 351, "text": "xx"}],
+        )
+
+    def test_pages_past_the_end_of_short_text_are_empty(self):
+        document_uuid = self.upload("abc", 5)
+        self.assertEqual(DocumentPage.objects.count(), 3)
+        response = self.get_pages(document_uuid, **{"from": 3, "to": 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["pages"], 5)
+        self.assertEqual(
+            response.data["page_texts"],
+            [
+                {"page_no": 3, "text": "c"},
+                {"page_no": 4, "text": ""},
+                {"page_no": 5, "text": ""},
+            ],
+        )
+        self.assertEqual(
+            self.get_pages(document_uuid, **{"from": 6}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    @override_settings(DOCUMENT_MAX_PAGES=100)
+    def test_huge_page_count_is_rejected(self):
+        response = self.client.post(
+            reverse("upload_document"),
+            data={"text": "x", "pages": 200000, "tags": []},
+            format="json",
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            reverse("upload_document_stream") + "?pages=200000",
+            data=b"x",
+            content_type="text/plain; charset=utf-8",
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Document.objects.exists())
+        self.assertFalse(DocumentPage.objects.exists())
+
+    def test_pages_are_stored_in_bounded_batches(self):
+        text = "\f".join("p" for _ in range(25))
+        with mock.patch("documents.pages.STORE_BATCH_ROWS", 10), mock.patch(
+            "documents.pages.DocumentPage.objects.bulk_create",
+            wraps=DocumentPage.objects.bulk_create,
+        ) as bulk_create:
+            self.upload(text, 25)
+        self.assertEqual(
+            [len(call.args[0]) for call in bulk_create.call_args_list], [10, 10, 5]
+        )
+        self.assertEqual(DocumentPage.objects.count(), 25)
+
+    def test_range_is_checked_against_form_feed_pages(self):
+        document_uuid = self.upload("one\ftwo\fthree", 2)
+        response = self.get_pages(document_uuid, **{"from": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["pages"], 3)
+        self.assertEqual(
+            response.data["page_texts"], [{"page_no": 3, "text": "three"}]
+        )
+        self.assertEqual(
+            self.get_pages(document_uuid, **{"from": 4}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    def test_upload_stores_one_row_per_page(self):
+        document_uuid = self.upload("Page one\fPage two\fPage three", 3)
+        document = Document.objects.get(uuid=document_uuid)
+        self.assertEqual(document.text, "")
+        self.assertEqual(
+            list(document.chunks.order_by("page_no").values_list("page_no", "text")),
+            [(1, "Page one\f"), (2, "Page two\f"), (3, "Page three")],
+        )
+
+    def test_range_read_returns_only_requested_pages(self):
+        text = "\f".join(f"Page {i}" for i in range(1, 401))
+        document_uuid = self.upload(text, 400)
+        response = self.get_pages(document_uuid, **{"from": 3, "to": 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["pages"], 400)
+        self.assertEqual(
+            response.data["page_texts"],
+            [{"page_no": 3, "text": "Page 3"}, {"page_no": 4, "text": "Page 4"}],
+        )
+        self.assertEqual(
+            self.get_pages(document_uuid, **{"from": 400}).data["page_texts"],
+            [{"page_no": 400, "text": "Page 400"}],
+        )
+
+    def test_invalid_ranges_are_rejected(self):
+        document_uuid = self.upload("one\ftwo", 2)
+        for params in [{"from": 0}, {"from": 2, "to": 1}, {"to": 3}, {"from": "x"}]:
+            response = self.get_pages(document_uuid, **params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(DOCUMENT_PAGE_RANGE_MAX=1):
+            response = self.get_pages(document_uuid, **{"from": 1, "to": 2})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pages_are_scoped_to_user(self):
+        other = User.objects.create_user(
+            email="other@example.com", password="Other@1234"
+        )
+        document = Document.objects.create(
+            pages=1, text="Private", tags=[], doc_type="ID Card", uploaded_by=other
+        )
+        response = self.get_pages(document.uuid)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_full_text_is_reassembled_in_list_and_stream(self):
+        text = "Account number 12345678\fTransaction history"
+        document_uuid = self.upload(text, 2)
+        response = self.client.get(reverse("list_documents"), HTTP_EMAIL="test@example.com")
+        self.assertEqual(response.data["documents"][0]["text"], text)
+
+        response = self.client.get(
+            reverse("document_text", args=[document_uuid]),
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b"".join(response.streaming_content).decode(), text)
+
+    def test_chunk_command_moves_inline_text_into_pages(self):
+        document = Document.objects.create(
+            pages=2,
+            text="First page\fSecond page",
+            tags=[],
+            doc_type="ID Card",
+            uploaded_by=self.user,
+        )
+        self.assertEqual(
+            self.get_pages(document.uuid, **{"from": 2}).data["page_texts"],
+            [{"page_no": 2, "text": "Second page"}],
+        )
+        call_command("chunk_documents", stdout=mock.Mock())
+        document.refresh_from_db()
+        self.assertEqual(document.text, "")
+        self.assertEqual(DocumentPage.objects.filter(document=document).count(), 2)
+        self.assertEqual(document.full_text, "First page\fSecond page")
+        self.assertEqual(
+            self.get_pages(document.uuid, **{"from": 2}).data["page_texts"],
+            [{"page_no": 2, "text": "Second page"}],
+        )
+
+
+class StreamingUploadTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        self.url = reverse("upload_document_stream")
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="test@example.com", HTTP_PASSWORD="Test@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+
+    def upload(self, body, query="pages=2&tags=bank", **extra):
+        return self.client.post(
+            f"{self.url}?{query}",
+            data=body,
+            content_type="text/plain; charset=utf-8",
+            HTTP_EMAIL="test@example.com",
+            **extra,
+        )
+
+    def test_analyzer_matches_keywords_split_across_chunks(self):
+        text = (
+            "x" * 200
+            + " Account Number: 1234 5678 and transaction history, valid number 42"
+        )
+        for size in (1, 7, 64, 201, 1000):
+            analyzer = TextAnalyzer()
+            for start in range(0, len(text), size):
+                analyzer.feed(text[start : start + size])
+            self.assertEqual(analyzer.finish(), analyze_text(text))
+        self.assertEqual(
+            analyze_text(text)[1], [("account_number", "12345678")]
+        )
+
+    @override_settings(DOCUMENT_UPLOAD_CHUNK_SIZE=16)
+    def test_raw_body_upload_is_classified_and_paged(self):
+        text = "Statement\fAccount Number: 1234-5678\ftransaction history"
+        response = self.upload(text.encode(), query="pages=3&tags=bank&tags=2024")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("text", response.data)
+        self.assertEqual(response.data["doc_type"], "Bank Statement")
+        self.assertEqual(response.data["tags"], ["bank", "2024"])
+
+        document = Document.objects.get(uuid=response.data["uuid"])
+        self.assertEqual(document.full_text, text)
+        self.assertEqual(document.chunks.count(), 3)
+        self.assertEqual(
+            list(DocumentField.objects.values_list("field", "value")),
+            [("account_number", "12345678")],
+        )
+
+    @override_settings(DOCUMENT_UPLOAD_CHUNK_SIZE=3)
+    def test_multibyte_characters_split_across_chunks(self):
+        text = "Passport number X1234567 – café " * 3
+        response = self.upload(text.encode(), query="pages=2")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        document = Document.objects.get(uuid=response.data["uuid"])
+        self.assertEqual(document.full_text, text)
+        self.assertEqual(document.doc_type, "Passport")
+
+    def test_multipart_upload(self):
+        response = self.client.post(
+            self.url,
+            data={
+                "text": SimpleUploadedFile("scan.txt", b"ID number: AB123456"),
+                "pages": "1",
+                "tags": ["id"],
+            },
+            format="multipart",
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["doc_type"], "ID Card")
+        document = Document.objects.get(uuid=response.data["uuid"])
+        self.assertEqual(document.full_text, "ID number: AB123456")
+
+    @override_settings(DOCUMENT_UPLOAD_MAX_BYTES=10, DOCUMENT_UPLOAD_CHUNK_SIZE=4)
+    def test_size_limit_is_enforced(self):
+        response = self.upload(b"x" * 11)
+        self.assertEqual(
+            response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        # Bodies without a trustworthy Content-Length are cut off while
+        # they are being read.
+        with self.assertRaises(UploadTooLarge):
+            spool_stream(io.BytesIO(b"x" * 11), 10)
+        spooled = spool_stream(io.BytesIO(b"x" * 10), 10)
+        self.assertEqual(spooled.length, 10)
+        spooled.close()
+        response = self.client.post(
+            self.url,
+            data={"text": SimpleUploadedFile("big.txt", b"x" * 11), "pages": "1"},
+            format="multipart",
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertFalse(Document.objects.exists())
+
+    def test_invalid_bodies_are_rejected(self):
+        self.assertEqual(self.upload(b"   ").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.upload(b"text", query="pages=x").status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            self.upload(b"\xff\xfe").status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_idempotent_retry_does_not_read_the_body(self):
+        first = self.upload(b"Passport number X1234567", HTTP_IDEMPOTENCY_KEY="s-1")
+        second = self.upload(b"Passport number X1234567", HTTP_IDEMPOTENCY_KEY="s-1")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.data["uuid"], first.data["uuid"])
+        self.assertEqual(Document.objects.count(), 1)
+
+
+class DocumentListingTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        self.list_url = reverse("list_documents")
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="test@example.com", HTTP_PASSWORD="Test@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+        now = timezone.now()
+        for i, (doc_type, pages) in enumerate(
+            [("Passport", 3), ("ID Card", 1), ("Passport", 12), ("Bank Statement", 7)]
+        ):
+            document = Document.objects.create(
+                pages=pages,
+                text=f"Document {i}",
+                tags=["even" if i % 2 == 0 else "odd"],
+                doc_type=doc_type,
+                uploaded_by=self.user,
+            )
+            Document.objects.filter(id=document.id).update(
+                created_at=now - timedelta(days=10 - i)
+            )
+
+    def list(self, **params):
+        return self.client.get(self.list_url, data=params, HTTP_EMAIL="test@example.com")
+
+    def pages_of(self, response):
+        return [document["pages"] for document in response.data["documents"]]
+
+    def test_ordering(self):
+        self.assertEqual(self.pages_of(self.list()), [3, 1, 12, 7])
+        self.assertEqual(self.pages_of(self.list(ordering="-created_at")), [7, 12, 1, 3])
+        self.assertEqual(self.pages_of(self.list(ordering="pages")), [1, 3, 7, 12])
+        self.assertEqual(self.pages_of(self.list(ordering="-pages")), [12, 7, 3, 1])
+
+    def test_filters_combine_and_count(self):
+        response = self.list(doc_type="Passport", ordering="-pages")
+        self.assertEqual(self.pages_of(response), [12, 3])
+        self.assertEqual(response.data["total_count"], 2)
+
+        response = self.list(pages_min=3, pages_max=7, page_size=1)
+        self.assertEqual(self.pages_of(response), [3])
+        self.assertEqual(response.data["total_count"], 2)
+
+        response = self.list(tags="EVEN", doc_type="Passport", pages_max=5)
+        self.assertEqual(self.pages_of(response), [3])
+        self.assertIn("created_at", response.data["documents"][0])
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in [{"ordering": "text"}, {"pages_min": "x"}, {"pages_max": "1.5"}]:
+            response = self.list(**params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    def test_supported_combinations_use_indexes(self):
+        # 20 tenants with interleaved uploads, this user owning 5% of them,
+        # so the planner weighs the indexes against realistic statistics.
+        others = User.objects.bulk_create(
+            User(email=f"tenant{n}@example.com", password="!") for n in range(19)
+        )
+        owners = [self.user, *others]
+        doc_types = [choice for choice, _ in Document.DOC_TYPE_CHOICES]
+        Document.objects.bulk_create(
+            Document(
+                pages=i * 7 % 50 + 1,
+                text="",
+                tags=[],
+                doc_type=doc_types[i // 20 % len(doc_types)],
+                uploaded_by=owners[i % len(owners)],
+            )
+            for i in range(20000)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE documents_document"
+                " SET created_at = timestamp '2024-01-01' + id * interval '1 minute'"
+            )
+            cursor.execute("ANALYZE documents_document")
+
+        base = Document.objects.filter(uploaded_by=self.user)
+        for ordering in ORDERINGS:
+            for doc_type in ("", "Passport"):
+                for pages_range in ({}, {"pages_min": "2", "pages_max": "10"}):
+                    # A doc_type and pages range narrow the rows enough to
+                    # sort them; otherwise the ordering's own index is read.
+                    if ordering.endswith("pages") or (doc_type and pages_range):
+                        column = "pages"
+                    else:
+                        column = "created"
+                    index = "document_user_%s%s_idx" % (
+                        "type_" if doc_type else "",
+                        column,
+                    )
+                    params = {"ordering": ordering, "doc_type": doc_type, **pages_range}
+                    queryset = filter_documents(base, params)
+                    for plan in (queryset[:10].explain(), queryset[20:30].explain()):
+                        with self.subTest(params=params):
+                            self.assertRegex(plan, rf"(?:using|on) {index}\b")
+                            self.assertRegex(
+                                plan, r"Index Cond: \(+uploaded_by_id = "
+                            )
+                            self.assertNotIn("Seq Scan", plan)
+                            self.assertNotIn("documents_document_pkey", plan)
+
+
+class TagSuggestTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        self.suggest_url = reverse("suggest_tags")
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="test@example.com", HTTP_PASSWORD="Test@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+        tag_indexes.clear()
+        self.addCleanup(tag_indexes.clear)
+
+    def upload(self, tags):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("upload_document"),
+                data={"text": "Sample", "pages": 1, "tags": tags},
+                format="json",
+                HTTP_EMAIL="test@example.com",
+            )
+        return response.data["uuid"]
+
+    def suggest(self, prefix, **params):
+        response = self.client.get(
+            self.suggest_url,
+            data={"prefix": prefix, **params},
+            HTTP_EMAIL="test@example.com",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(s["tag"], s["count"]) for s in response.data["suggestions"]]
+
+    def test_prefix_index(self):
+        index = TagIndex({"tax": 1, "taxes": 3, "travel": 2, "t": 1, "bank": 5})
+        self.assertEqual(index.suggest("ta", 10), ["taxes", "tax"])
+        self.assertEqual(index.suggest("t", 2), ["taxes", "travel"])
+        self.assertEqual(index.suggest("", 1), ["bank"])
+        index.remove("taxes")
+        index.add("tap")
+        self.assertEqual(index.suggest("ta", 10), ["taxes", "tap", "tax"])
+        self.assertEqual(index.suggest("z", 10), [])
+
+    def test_suggestions_are_ranked_by_usage(self):
+        self.upload(["tax", "2023"])
+        self.upload(["tax", "taxes"])
+        self.upload(["travel"])
+        self.assertEqual(self.suggest("ta"), [("tax", 2), ("taxes", 1)])
+        self.assertEqual(self.suggest("t", limit=1), [("tax", 2)])
+
+    def test_writes_update_the_index_without_rebuilding(self):
+        first = self.upload(["tax"])
+        self.assertEqual(self.suggest("t"), [("tax", 1)])
+
+        with mock.patch.object(tag_indexes, "_build") as build:
+            second = self.upload(["tax", "trip"])
+            self.assertEqual(self.suggest("t"), [("tax", 2), ("trip", 1)])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.put(
+                    reverse("update_document", args=[first]),
+                    data={"tags": ["trip"]},
+                    format="json",
+                    HTTP_EMAIL="test@example.com",
+                )
+            self.assertEqual(self.suggest("t"), [("trip", 2), ("tax", 1)])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(
+                    reverse("delete_document", args=[second]),
+                    HTTP_EMAIL="test@example.com",
+                )
+            self.assertEqual(self.suggest("t"), [("trip", 1)])
+            build.assert_not_called()
+
+    def test_warm_index_does_not_query_documents(self):
+        self.upload(["tax"])
+        tag_indexes.suggest(self.user.id, "t", 10)
+        with self.assertNumQueries(0):
+            self.assertEqual(tag_indexes.suggest(self.user.id, "t", 10), [("tax", 1)])
+
+    def test_write_from_another_worker_triggers_rebuild(self):
+        self.upload(["tax"])
+        self.assertEqual(self.suggest("t"), [("tax", 1)])
+        # Another worker commits a document and bumps the shared version.
+        Document.objects.create(
+            pages=1, text="Sample", tags=["trip"], doc_type="ID Card", uploaded_by=self.user
+        )
+        cache.incr(f"tag-index-version:{self.user.id}")
+        self.assertEqual(self.suggest("t"), [("tax", 1), ("trip", 1)])
+
+    def test_index_built_before_on_commit_does_not_count_write_twice(self):
+        self.upload(["red"])
+        self.assertEqual(self.suggest("r"), [("red", 1)])
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                Document.objects.create(
+                    pages=1, text="Sample", tags=["red"], uploaded_by=self.user
+                )
+                record_tag_change(self.user.id, added=["red"])
+        # Another thread rebuilds from the committed rows before this
+        # write's on_commit callback runs.
+        tag_indexes.clear()
+        self.assertEqual(self.suggest("r"), [("red", 2)])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.suggest("r"), [("red", 2)])
+
+    def test_index_is_not_kept_when_a_write_starts_during_the_build(self):
+        self.upload(["red"])
+
+        def build_during_write(user_id):
+            index = TagIndex({"red": 1})
+            tag_indexes.bump(user_id)
+            return index
+
+        with mock.patch.object(tag_indexes, "_build", side_effect=build_during_write):
+            tag_indexes.suggest(self.user.id, "r", 10)
+        self.assertNotIn(self.user.id, tag_indexes._indexes)
+
+    def test_least_recently_used_index_is_evicted(self):
+        other = User.objects.create_user(
+            email="other@example.com", password="Other@1234"
+        )
+        Document.objects.create(
+            pages=1, text="Sample", tags=["trip"], doc_type="ID Card", uploaded_by=other
+        )
+        self.upload(["tax"])
+        with override_settings(TAG_INDEX_MAX_BYTES=1):
+            tag_indexes.suggest(self.user.id, "", 10)
+            tag_indexes.suggest(other.id, "", 10)
+            with mock.patch.object(
+                tag_indexes, "_build", wraps=tag_indexes._build
+            ) as build:
+                tag_indexes.suggest(other.id, "", 10)
+                build.assert_not_called()
+                tag_indexes.suggest(self.user.id, "", 10)
+                build.assert_called_once_with(self.user.id)
+
+
+class BulkSignupTest(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email="admin@example.com", password="Admin@1234", is_staff=True
+        )
+        self.url = reverse("bulk_signup")
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="admin@example.com", HTTP_PASSWORD="Admin@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+
+    def test_creates_users_and_reports_row_errors(self):
+        User.objects.create_user(email="taken@example.com", password="Taken@1234")
+        response = self.client.post(
+            self.url,
+            data={
+                "users": [
+                    {"email": "one@example.com", "password": "One@12345"},
+                    {"email": "not-an-email", "password": "Two@12345"},
+                    {"email": "three@example.com", "password": "weak"},
+                    {"email": "taken@example.com", "password": "Four@1234"},
+                    {"email": "one@EXAMPLE.com", "password": "Five@1234"},
+                    {"email": "six@example.com"},
+                    {"email": "seven@example.com", "password": "Seven@123"},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(
+            [(error["row"], error["error"]) for error in response.data["errors"]],
+            [
+                (2, "Invalid email format"),
+                (3, response.data["errors"][1]["error"]),
+                (4, "Email already registered"),
+                (5, "Duplicate email in batch"),
+                (6, "Email and password are required"),
+            ],
+        )
+        self.assertIn("Password must be", response.data["errors"][1]["error"])
+        self.assertIn("users_per_second", response.data)
+
+        self.client.credentials()
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="seven@example.com", HTTP_PASSWORD="Seven@123"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_request_is_capped_and_hashed_in_process(self):
+        rows = [
+            {"email": f"user{i}@example.com", "password": "User@1234"}
+            for i in range(settings.BULK_SIGNUP_MAX_USERS + 1)
+        ]
+        response = self.client.post(self.url, data={"users": rows}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("import_users", response.data["error"])
+
+        with mock.patch(
+            "concurrent.futures.ProcessPoolExecutor"
+        ) as pool, mock.patch(
+            "documents.provisioning.make_password", side_effect=lambda p: f"hash:{p}"
+        ):
+            response = self.client.post(
+                self.url, data={"users": rows[:-1]}, format="json"
+            )
+        self.assertEqual(response.data["created"], settings.BULK_SIGNUP_MAX_USERS)
+        pool.assert_not_called()
+
+    def test_staff_only(self):
+        User.objects.create_user(email="user@example.com", password="User@1234")
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="user@example.com", HTTP_PASSWORD="User@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+        response = self.client.post(
+            self.url,
+            data={"users": [{"email": "a@example.com", "password": "Abcd@1234"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_existing_emails_are_checked_in_one_query(self):
+        rows = [
+            {"email": f"user{i}@example.com", "password": "User@1234"}
+            for i in range(5)
+        ]
+        with mock.patch(
+            "documents.provisioning.make_password", side_effect=lambda p: f"hash:{p}"
+        ):
+            with self.assertNumQueries(4):  # savepoint, IN query, insert, release
+                result = bulk_create_users(rows, workers=1)
+        self.assertEqual(len(result.created), 5)
+
+    def test_passwords_are_hashed_in_worker_processes(self):
+        passwords = [f"Secret@{i}" for i in range(16)]
+        with override_settings(
+            PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"]
+        ):
+            hashes = hash_passwords(passwords, workers=2)
+            for password, hashed in zip(passwords, hashes):
+                self.assertTrue(check_password(password, hashed))
+        self.assertEqual(len(set(hashes)), 16)
+
+    def test_import_users_command(self):
+        User.objects.create_user(email="taken@example.com", password="Taken@1234")
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as handle:
+            handle.write("email,password\n")
+            handle.write("new1@example.com,New1@1234\n")
+            handle.write("taken@example.com,Taken@1234\n")
+            handle.write("new2@example.com,New2@1234\n")
+        self.addCleanup(os.unlink, handle.name)
+
+        stdout, stderr = mock.Mock(), mock.Mock()
+        call_command(
+            "import_users", handle.name, batch_size=2, stdout=stdout, stderr=stderr
+        )
+        self.assertTrue(User.objects.filter(email="new2@example.com").exists())
+        stderr.write.assert_called_once_with(
+            "line 3: taken@example.com: Email already registered\n"
+        )
+        self.assertIn("Created 2 users, 1 failed", stdout.write.call_args[0][0])
+
+
+def fetch_one_by_one(ids):
+    return [Document.objects.get(id=document_id) for document_id in ids]
+
+
+class QueryBudgetTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="Test@1234"
+        )
+        response = self.client.get(
+            reverse("login"), HTTP_EMAIL="test@example.com", HTTP_PASSWORD="Test@1234"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+        self.documents = [
+            Document.objects.create(
+                pages=1, text=f"Document {i}", tags=[], uploaded_by=self.user
+            )
+            for i in range(4)
+        ]
+
+    def list_with_budget(self, budget):
+        key = (views.list_documents.__module__, views.list_documents.__name__)
+        with mock.patch.dict("documents.querybudget._budgets", {key: budget}):
+            return self.client.get(
+                reverse("list_documents"), HTTP_EMAIL="test@example.com"
+            )
+
+    def test_every_route_has_a_budget(self):
+        for pattern in urls.urlpatterns:
+            self.assertIsNotNone(get_budget(pattern.callback), pattern.name)
+
+    def test_tests_run_with_strict_budgets(self):
+        self.assertTrue(settings.QUERY_BUDGET_ENABLED)
+        self.assertTrue(settings.QUERY_BUDGET_STRICT)
+
+    @override_settings(QUERY_BUDGET_ENABLED=False)
+    def test_nothing_is_recorded_when_disabled(self):
+        with mock.patch("documents.querybudget.QueryRecorder") as recorder:
+            response = self.list_with_budget(1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recorder.assert_not_called()
+
+    def test_sql_shape_ignores_literals_and_list_lengths(self):
+        self.assertEqual(
+            sql_shape('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) LIMIT 21'),
+            sql_shape('SELECT * FROM "t" WHERE "id" IN (%s) LIMIT 21'),
+        )
+        self.assertEqual(
+            sql_shape('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO "t" ("a", "b") VALUES (%s...)',
+        )
+        self.assertEqual(sql_shape("SELECT 1 FROM t2 LIMIT 5"), "SELECT N FROM t2 LIMIT N")
+
+    def test_repeated_query_is_reported_with_its_caller(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            fetch_one_by_one([document.id for document in self.documents])
+        self.assertEqual(recorder.count, 4)
+        problems = recorder.problems(budget=10)
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0].startswith("4x SELECT"))
+        self.assertIn("documents/tests.py", problems[0])
+        self.assertIn("in fetch_one_by_one", problems[0])
+
+    def test_unbudgeted_queries_are_not_counted(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            Document.objects.count()
+            with mock.patch("documents.querybudget._recorder") as current:
+                current.get.return_value = recorder
+                with unbudgeted():
+                    fetch_one_by_one([document.id for document in self.documents])
+        self.assertEqual(recorder.count, 1)
+        self.assertEqual(recorder.problems(budget=1), [])
+
+    def test_exceeding_budget_raises_in_strict_mode(self):
+        with self.assertRaisesRegex(
+            QueryBudgetExceeded, r"list_documents: \d+ queries, budget is 1"
+        ):
+            self.list_with_budget(1)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_exceeding_budget_is_logged_otherwise(self):
+        with self.assertLogs("documents.querybudget", "WARNING") as logs:
+            response = self.list_with_budget(1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("budget is 1", logs.output[0])
+
+    def test_request_within_budget_passes(self):
+        response = self.list_with_budget(get_budget(views.list_documents))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["documents"]), 4)
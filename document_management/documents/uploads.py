@@ -0,0 +1,105 @@
+"""
+Streaming document uploads.
+
+The request body is copied to a temporary file in DOCUMENT_UPLOAD_CHUNK_SIZE
+pieces. Each piece is decoded and fed to a TextAnalyzer on the way through,
+so the document type and identifier fields are known once the body has
+been read, without the text ever being held in memory as a whole. The file
+is then read back chunk by chunk to classify the text and store its pages.
+"""
+
+import codecs
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+
+from .extraction import TextAnalyzer
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class SpooledText:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.file = tempfile.TemporaryFile()
+        self.size = 0
+        self.length = 0
+        self.paged = False
+        self.blank = True
+        self.analysis = None
+        self._analyzer = TextAnalyzer()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def _feed(self, text):
+        self.length += len(text)
+        self.paged = self.paged or "\f" in text
+        self.blank = self.blank and not text.strip()
+        self._analyzer.feed(text)
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.max_bytes)
+        self._feed(self._decoder.decode(data))
+        self.file.write(data)
+
+    def finish(self):
+        self._feed(self._decoder.decode(b"", final=True))
+        self.analysis = self._analyzer.finish()
+        return self
+
+    def chunks(self):
+        """Yield the spooled text again, decoded, one chunk at a time."""
+        self.file.seek(0)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        while True:
+            data = self.file.read(settings.DOCUMENT_UPLOAD_CHUNK_SIZE)
+            if not data:
+                break
+            yield decoder.decode(data)
+        yield decoder.decode(b"", final=True)
+
+    def close(self):
+        self.file.close()
+
+
+def spool_stream(stream, max_bytes):
+    spooled = SpooledText(max_bytes)
+    try:
+        while True:
+            data = stream.read(settings.DOCUMENT_UPLOAD_CHUNK_SIZE)
+            if not data:
+                break
+            spooled.write(data)
+        return spooled.finish()
+    except BaseException:
+        spooled.close()
+        raise
+
+
+class SpoolingUploadHandler(FileUploadHandler):
+    """Multipart upload handler that spools each file into a SpooledText."""
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, request=None, max_bytes=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.spooled = []
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.spooled.append(SpooledText(self.max_bytes))
+
+    def receive_data_chunk(self, raw_data, start):
+        self.spooled[-1].write(raw_data)
+
+    def file_complete(self, file_size):
+        return self.spooled[-1].finish()
+
+    def close(self):
+        for spooled in self.spooled:
+            spooled.close()
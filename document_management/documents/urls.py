@@ -3,9 +3,18 @@ from . import views
 
 urlpatterns = [
     path('signup/', views.signup, name='signup'),
+    path('signup/bulk/', views.bulk_signup, name='bulk_signup'),
     path('login/', views.login, name='login'),
+    path('logout/', views.logout, name='logout'),
     path('upload/', views.upload_document, name='upload_document'),
+    path('upload/stream/', views.upload_document_stream, name='upload_document_stream'),
     path('list/', views.list_documents, name='list_documents'),
+    path('lookup/', views.lookup_documents, name='lookup_documents'),
+    path('tags/suggest/', views.suggest_tags, name='suggest_tags'),
+    path('documents/<uuid:document_id>/pages/', views.document_pages, name='document_pages'),
+    path('documents/<uuid:document_id>/text/', views.document_text, name='document_text'),
     path('update/<uuid:document_id>/', views.update_document, name='update_document'),
     path('delete/<uuid:document_id>/', views.delete_document, name='delete_document'),
+    path('changes/', views.list_changes, name='list_changes'),
+    path('admission/stats/', views.admission_stats_view, name='admission_stats'),
 ]
@@ -3,35 +3,45 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 
 from django.conf import settings
-from .models import Document
-from .serializers import DocumentSerializer
+from django.db import transaction
+from .admission import stats as admission_stats
+from .changes import acknowledge, changes_since, get_sequence, record_change
+from .classifier import classify_texts
+from .extraction import analyze_text, normalize_field_value
+from .idempotency import idempotent
+from .listing import InvalidListParameter, filter_documents
+from .models import Document, DocumentChange, DocumentField
+from .pages import (
+    iter_pages,
+    page_count,
+    read_pages,
+    split_pages,
+    store_pages,
+    with_text,
+)
+from .provisioning import (
+    bulk_create_users,
+    validate_password_strength,
+    validate_user_email,
+)
+from .querybudget import query_budget, unbudgeted
+from .revocation import revocation_list
+from .routers import pin_to_primary, read_from_replica
+from .serializers import DocumentMetadataSerializer, DocumentSerializer
+from .tagindex import record_tag_change, tag_indexes
+from .uploads import SpoolingUploadHandler, UploadTooLarge, spool_stream
 from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
+from rest_framework_simplejwt.exceptions import TokenError
+from django.http import StreamingHttpResponse
 from django.contrib.auth import get_user_model
-from django.core.validators import validate_email
-from django.core.exceptions import ValidationError
 from django.contrib.auth.hashers import check_password
 
-import re
+import time
 import uuid
 
 User = get_user_model()
 
 
-def validate_user_email(email):
-    try:
-        validate_email(email)
-    except ValidationError:
-        raise ValueError("Invalid email format")
-
-
-def validate_password_strength(password):
-    password_regex = re.compile(r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d).{8,}$")
-    if not password_regex.match(password):
-        raise ValueError(
-            "Password must be at least 8 characters long, contain at least one uppercase letter, one lowercase letter, and one digit."
-        )
-
-
 def decode_jwt_token(token):
     try:
         decoded_token = AccessToken(token)
@@ -40,23 +50,9 @@ def decode_jwt_token(token):
         raise ValueError(f"Invalid or expired token: {str(e)}")
 
 
-def detect_document_type(text):
-    keywords = {
-        "ID Card": ["id number", "date of birth"],
-        "IRS Form": ["internal revenue service", "taxpayer id"],
-        "Passport": ["passport number", "nationality"],
-        "Bank Statement": ["account number", "transaction history"],
-    }
-
-    text = text.lower()
-    for doc_type, terms in keywords.items():
-        if any(re.search(term, text) for term in terms):
-            return doc_type
-    return "Unknown"
-
-
 @api_view(["POST"])
 @permission_classes([permissions.AllowAny])
+@query_budget(2)
 def signup(request):
     email = request.data.get("email")
     password = request.data.get("password")
@@ -75,15 +71,44 @@ def signup(request):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         validate_password_strength(password)
-        User.objects.create_user(email=email, password=password)
+        user = User.objects.create_user(email=email, password=password)
+        # Until the replicas have the new account, its requests must not
+        # authenticate against them.
+        pin_to_primary(user.id)
     except ValueError as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     return Response({"message": "Signup successful"}, status=status.HTTP_201_CREATED)
 
 
+@api_view(["POST"])
+@permission_classes([permissions.IsAdminUser])
+@query_budget(3)
+def bulk_signup(request):
+    users = request.data.get("users")
+    if not isinstance(users, list) or not users:
+        return Response(
+            {"error": "users must be a non-empty list of email/password objects."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if len(users) > settings.BULK_SIGNUP_MAX_USERS:
+        return Response(
+            {
+                "error": f"At most {settings.BULK_SIGNUP_MAX_USERS} users per "
+                "request; use manage.py import_users for larger imports."
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Hash in this process: forking a pool from a web worker per request
+    # is not worth it for at most BULK_SIGNUP_MAX_USERS passwords.
+    result = bulk_create_users(users, workers=1)
+    return Response(result.as_dict(), status=status.HTTP_200_OK)
+
+
 @api_view(["GET"])
 @permission_classes([permissions.AllowAny])
+@query_budget(2)
 def login(request):
     email = request.headers.get("email")
     password = request.headers.get("password")
@@ -115,6 +140,59 @@ def login(request):
 
 @api_view(["POST"])
 @permission_classes([permissions.IsAuthenticated])
+@query_budget(6)
+def logout(request):
+    email = request.headers.get("email")
+    auth_token = request.headers.get("Authorization")
+    refresh_token = request.data.get("refresh_token")
+
+    if not email or not auth_token:
+        return Response(
+            {"error": "Email and Authorization headers are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if not refresh_token:
+        return Response(
+            {"error": "Refresh token is required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        token = auth_token.split(" ")[1]
+        decoded_token = decode_jwt_token(token)
+        user_id = decoded_token["user_id"]
+        user = User.objects.get(email=email)
+        if user.id != user_id:
+            return Response(
+                {"error": "Email does not match the token's user."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+    except (IndexError, ValueError, User.DoesNotExist) as e:
+        return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        refresh = RefreshToken(refresh_token)
+    except TokenError as e:
+        return Response(
+            {"error": f"Invalid or expired refresh token: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if refresh["user_id"] != user_id:
+        return Response(
+            {"error": "Refresh token does not belong to this user."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    revocation_list.revoke(refresh)
+    revocation_list.revoke(decoded_token)
+
+    return Response({"message": "Logout successful"}, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+@query_budget(12)
+@idempotent
 def upload_document(request):
     email = request.headers.get("email")
     auth_token = request.headers.get("Authorization")
@@ -152,23 +230,161 @@ def upload_document(request):
             {"error": "Pages must be a positive integer."},
             status=status.HTTP_400_BAD_REQUEST,
         )
+    if pages > settings.DOCUMENT_MAX_PAGES:
+        return Response(
+            {"error": f"Pages must be at most {settings.DOCUMENT_MAX_PAGES}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-    doc_type = detect_document_type(text)
-    document = Document.objects.create(
-        uuid=uuid.uuid4(),
-        pages=pages,
-        text=text,
-        tags=tags,
-        doc_type=doc_type,
-        uploaded_by=user,
-    )
+    doc_type, fields = analyze_text(text)
+    doc_type = classify_texts([text], [doc_type])[0]
+    with transaction.atomic():
+        document = Document.objects.create(
+            uuid=uuid.uuid4(),
+            pages=pages,
+            text="",
+            tags=tags,
+            doc_type=doc_type,
+            uploaded_by=user,
+        )
+        DocumentField.objects.bulk_create(
+            DocumentField(user=user, document=document, field=field, value=value)
+            for field, value in fields
+        )
+        store_pages(document, split_pages(text, pages))
+        record_change(user.id, DocumentChange.INSERT, document.uuid)
+        record_tag_change(user.id, added=tags)
 
+    # Serve the response from the text in hand rather than re-reading the
+    # pages just stored; only this in-memory instance is changed.
+    document.text = text
     serializer = DocumentSerializer(document)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+@query_budget(12)
+@idempotent(hash_body=False)
+def upload_document_stream(request):
+    email = request.headers.get("email")
+    auth_token = request.headers.get("Authorization")
+
+    if not email or not auth_token:
+        return Response(
+            {"error": "Email and Authorization headers are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        token = auth_token.split(" ")[1]
+        decoded_token = decode_jwt_token(token)
+        user_id = decoded_token["user_id"]
+        user = User.objects.get(email=email)
+        if user.id != user_id:
+            return Response(
+                {"error": "Email does not match the token's user."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+    except (IndexError, ValueError, User.DoesNotExist) as e:
+        return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    max_bytes = settings.DOCUMENT_UPLOAD_MAX_BYTES
+    try:
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > max_bytes:
+        return Response(
+            {"error": f"Uploads are limited to {max_bytes} bytes."},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    # Multipart bodies are spooled by the upload handler while DRF parses
+    # them; any other body is read from the raw stream as text.
+    multipart = request.content_type.startswith("multipart/form-data")
+    handler = SpoolingUploadHandler(request, max_bytes)
+    try:
+        if multipart:
+            request.upload_handlers = [handler]
+            params = request.data
+            spooled = request.FILES.get("text")
+        else:
+            params = request.query_params
+            spooled = (
+                spool_stream(request.stream, max_bytes)
+                if request.stream is not None
+                else None
+            )
+            if spooled is not None:
+                handler.spooled.append(spooled)
+    except UploadTooLarge:
+        handler.close()
+        return Response(
+            {"error": f"Uploads are limited to {max_bytes} bytes."},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+    except UnicodeDecodeError:
+        handler.close()
+        return Response(
+            {"error": "Text must be UTF-8 encoded."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        if spooled is None or spooled.blank:
+            return Response(
+                {"error": "Text must be a non-empty string."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            pages = int(params.get("pages", ""))
+        except ValueError:
+            pages = 0
+        if pages <= 0:
+            return Response(
+                {"error": "Pages must be a positive integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if pages > settings.DOCUMENT_MAX_PAGES:
+            return Response(
+                {"error": f"Pages must be at most {settings.DOCUMENT_MAX_PAGES}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        tags = params.getlist("tags")
+
+        doc_type, fields = spooled.analysis
+        doc_type = classify_texts([spooled.chunks()], [doc_type])[0]
+        with transaction.atomic():
+            document = Document.objects.create(
+                uuid=uuid.uuid4(),
+                pages=pages,
+                text="",
+                tags=tags,
+                doc_type=doc_type,
+                uploaded_by=user,
+            )
+            DocumentField.objects.bulk_create(
+                DocumentField(user=user, document=document, field=field, value=value)
+                for field, value in fields
+            )
+            store_pages(
+                document,
+                iter_pages(spooled.chunks(), pages, spooled.length, spooled.paged),
+            )
+            record_change(user.id, DocumentChange.INSERT, document.uuid)
+            record_tag_change(user.id, added=tags)
+    finally:
+        handler.close()
+
+    serializer = DocumentMetadataSerializer(document)
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
+@query_budget(5)
+@read_from_replica
 def list_documents(request):
     email = request.headers.get("email")
     auth_token = request.headers.get("Authorization")
@@ -192,11 +408,13 @@ def list_documents(request):
     except (IndexError, ValueError, User.DoesNotExist) as e:
         return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
 
-    documents = Document.objects.filter(uploaded_by=user)
-    tags_filter = request.query_params.get("tags", None)
-    if tags_filter:
-        tags_filter = tags_filter.lower()
-        documents = documents.filter(tags__contains=[tags_filter])
+    try:
+        documents = filter_documents(
+            Document.objects.filter(uploaded_by=user), request.query_params
+        )
+    except InvalidListParameter as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    total_count = documents.count()
 
     try:
         page_size = int(
@@ -214,12 +432,7 @@ def list_documents(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    total_documents = Document.objects.filter(uploaded_by=user)
-    if tags_filter:
-        total_documents = total_documents.filter(tags__contains=[tags_filter])
-    total_count = total_documents.count()
-
-    serializer = DocumentSerializer(documents, many=True)
+    serializer = DocumentSerializer(with_text(documents), many=True)
     response_data = {
         "total_count": total_count,
         "page_size": page_size,
@@ -231,8 +444,217 @@ def list_documents(request):
     return Response(response_data, status=status.HTTP_200_OK)
 
 
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+@query_budget(4)
+@read_from_replica
+def lookup_documents(request):
+    email = request.headers.get("email")
+    auth_token = request.headers.get("Authorization")
+
+    if not email or not auth_token:
+        return Response(
+            {"error": "Email and Authorization headers are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        token = auth_token.split(" ")[1]
+        decoded_token = decode_jwt_token(token)
+        user_id = decoded_token["user_id"]
+        user = User.objects.get(email=email)
+        if user.id != user_id:
+            return Response(
+                {"error": "Email does not match the token's user."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+    except (IndexError, ValueError, User.DoesNotExist) as e:
+        return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    field = request.query_params.get("field")
+    value = request.query_params.get("value")
+    valid_fields = dict(DocumentField.FIELD_CHOICES)
+    if field not in valid_fields or not value:
+        return Response(
+            {
+                "error": "field must be one of "
+                f"{', '.join(valid_fields)} and value is required."
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    matches = with_text(
+        DocumentField.objects.filter(
+            user=user, field=field, value=normalize_field_value(value)
+        ).select_related("document"),
+        prefix="document__",
+    )
+    serializer = DocumentSerializer([match.document for match in matches], many=True)
+
+    return Response({"documents": serializer.data}, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+@query_budget(5)
+@read_from_replica
+def document_pages(request, document_id):
+    email = request.headers.get("email")
+    auth_token = request.headers.get("Authorization")
+
+    if not email or not auth_token:
+        return Response(
+            {"error": "Email and Authorization headers are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        token = auth_token.split(" ")[1]
+        decoded_token = decode_jwt_token(token)
+        user_id = decoded_token["user_id"]
+        user = User.objects.get(email=email)
+        if user.id != user_id:
+            return Response(
+                {"error": "Email does not match the token's user."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+    except (IndexError, ValueError, User.DoesNotExist) as e:
+        return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        document = Document.objects.get(uuid=document_id, uploaded_by=user)
+    except Document.DoesNotExist:
+        return Response(
+            {"error": f"Document with id {document_id} not found."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    try:
+        first = int(request.query_params.get("from", 1))
+        last = int(request.query_params.get("to", first))
+    except ValueError:
+        return Response(
+            {"error": "from and to must be integers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    pages = page_count(document)
+    if not 1 <= first <= last <= pages:
+        return Response(
+            {"error": f"from and to must satisfy 1 <= from <= to <= {pages}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if last - first + 1 > settings.DOCUMENT_PAGE_RANGE_MAX:
+        return Response(
+            {
+                "error": "At most "
+                f"{settings.DOCUMENT_PAGE_RANGE_MAX} pages can be read at once."
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    response_data = {
+        "uuid": document.uuid,
+        "pages": pages,
+        "from": first,
+        "to": last,
+        "page_texts": [
+            {"page_no": page_no, "text": text}
+            for page_no, text in read_pages(document, first, last)
+        ],
+    }
+
+    return Response(response_data, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+@query_budget(3)
+@read_from_replica
+def document_text(request, document_id):
+    email = request.headers.get("email")
+    auth_token = request.headers.get("Authorization")
+
+    if not email or not auth_token:
+        return Response(
+            {"error": "Email and Authorization headers are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        token = auth_token.split(" ")[1]
+        decoded_token = decode_jwt_token(token)
+        user_id = decoded_token["user_id"]
+        user = User.objects.get(email=email)
+        if user.id != user_id:
+            return Response(
+                {"error": "Email does not match the token's user."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+    except (IndexError, ValueError, User.DoesNotExist) as e:
+        return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        document = Document.objects.get(uuid=document_id, uploaded_by=user)
+    except Document.DoesNotExist:
+        return Response(
+            {"error": f"Document with id {document_id} not found."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    # Pages are read from the database as the response is written, so the
+    # full text is never held in memory.
+    return StreamingHttpResponse(
+        document.iter_text(), content_type="text/plain; charset=utf-8"
+    )
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+@query_budget(3)
+def suggest_tags(request):
+    email = request.headers.get("email")
+    auth_token = request.headers.get("Authorization")
+
+    if not email or not auth_token:
+        return Response(
+            {"error": "Email and Authorization headers are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        token = auth_token.split(" ")[1]
+        decoded_token = decode_jwt_token(token)
+        user_id = decoded_token["user_id"]
+        user = User.objects.get(email=email)
+        if user.id != user_id:
+            return Response(
+                {"error": "Email does not match the token's user."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+    except (IndexError, ValueError, User.DoesNotExist) as e:
+        return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    prefix = request.query_params.get("prefix", "")
+    try:
+        limit = int(request.query_params.get("limit", settings.TAG_SUGGEST_LIMIT))
+    except ValueError:
+        return Response(
+            {"error": "limit must be an integer."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    limit = min(max(limit, 1), settings.TAG_SUGGEST_MAX_LIMIT)
+
+    suggestions = tag_indexes.suggest(user.id, prefix, limit)
+    response_data = {
+        "suggestions": [{"tag": tag, "count": count} for tag, count in suggestions]
+    }
+
+    return Response(response_data, status=status.HTTP_200_OK)
+
+
 @api_view(["PUT"])
 @permission_classes([permissions.IsAuthenticated])
+@query_budget(8)
 def update_document(request, document_id):
     email = request.headers.get("email")
     auth_token = request.headers.get("Authorization")
@@ -276,8 +698,12 @@ def update_document(request, document_id):
             status=status.HTTP_404_NOT_FOUND,
         )
 
+    old_tags = document.tags
     document.tags = request.data.get("tags", document.tags)
-    document.save()
+    with transaction.atomic():
+        document.save()
+        record_change(user.id, DocumentChange.UPDATE, document.uuid)
+        record_tag_change(user.id, added=document.tags, removed=old_tags)
 
     serializer = DocumentSerializer(document)
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -285,6 +711,7 @@ def update_document(request, document_id):
 
 @api_view(["DELETE"])
 @permission_classes([permissions.IsAuthenticated])
+@query_budget(10)
 def delete_document(request, document_id):
     email = request.headers.get("email")
     auth_token = request.headers.get("Authorization")
@@ -308,7 +735,10 @@ def delete_document(request, document_id):
 
         try:
             document = Document.objects.get(uuid=document_id, uploaded_by_id=user_id)
-            document.delete()
+            with transaction.atomic():
+                document.delete()
+                record_change(user.id, DocumentChange.DELETE, document.uuid)
+                record_tag_change(user.id, removed=document.tags)
         except Document.DoesNotExist:
             return Response(
                 {"error": f"Document with id {document_id} not found."},
@@ -321,3 +751,112 @@ def delete_document(request, document_id):
     return Response(
         {"message": "Document deleted successfully"}, status=status.HTTP_204_NO_CONTENT
     )
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+@query_budget(7)
+@read_from_replica
+def list_changes(request):
+    email = request.headers.get("email")
+    auth_token = request.headers.get("Authorization")
+
+    if not email or not auth_token:
+        return Response(
+            {"error": "Email and Authorization headers are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        token = auth_token.split(" ")[1]
+        decoded_token = decode_jwt_token(token)
+        user_id = decoded_token["user_id"]
+        user = User.objects.get(email=email)
+        if user.id != user_id:
+            return Response(
+                {"error": "Email does not match the token's user."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+    except (IndexError, ValueError, User.DoesNotExist) as e:
+        return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        since = int(request.query_params.get("since", 0))
+        limit = int(
+            request.query_params.get("limit", settings.CHANGE_FEED_PAGE_SIZE)
+        )
+        wait = float(request.query_params.get("wait", 0))
+    except ValueError:
+        return Response(
+            {"error": "since, limit and wait must be numbers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if since < 0 or limit <= 0:
+        return Response(
+            {"error": "since must be non-negative and limit must be positive."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    limit = min(limit, settings.CHANGE_FEED_MAX_PAGE_SIZE)
+    wait = min(max(wait, 0), settings.CHANGE_FEED_MAX_WAIT_SECONDS)
+
+    sequence = get_sequence(user.id)
+    if since < sequence.compacted_seq:
+        return Response(
+            {
+                "error": f"Changes up to sequence {sequence.compacted_seq} have "
+                "been compacted. Re-list documents and resume from last_seq.",
+                "last_seq": sequence.last_seq,
+            },
+            status=status.HTTP_410_GONE,
+        )
+
+    client_id = request.query_params.get("client")
+    if client_id:
+        acknowledge(user.id, client_id[:64], since)
+
+    deadline = time.monotonic() + wait
+    changes, has_more = changes_since(user.id, since, limit)
+    with unbudgeted():
+        while not changes and time.monotonic() < deadline:
+            time.sleep(settings.CHANGE_FEED_POLL_INTERVAL_SECONDS)
+            changes, has_more = changes_since(user.id, since, limit)
+
+    # Metadata only: clients fetch the text of the documents they need from
+    # documents/<uuid>/pages/ or /text/ instead of receiving every page here.
+    current = {
+        document.uuid: document
+        for document in Document.objects.filter(
+            uploaded_by=user,
+            uuid__in=[
+                change.document_uuid
+                for change in changes
+                if change.action != DocumentChange.DELETE
+            ],
+        ).defer("text")
+    }
+    response_data = {
+        "changes": [
+            {
+                "seq": change.seq,
+                "action": change.action,
+                "document_uuid": change.document_uuid,
+                "document": DocumentMetadataSerializer(
+                    current[change.document_uuid]
+                ).data
+                if change.document_uuid in current
+                else None,
+            }
+            for change in changes
+        ],
+        "last_seq": changes[-1].seq if changes else since,
+        "has_more": has_more,
+    }
+
+    return Response(response_data, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+@query_budget(1)
+def admission_stats_view(request):
+    return Response(admission_stats.snapshot(), status=status.HTTP_200_OK)